@@ -28,6 +28,11 @@ for dt in aml['Digital Threads']:
                   f'''InputFile: {inputFile['Name']}''')
             break
 
+# Query the Operations of every Digital Thread
+print(f'''Operations by Stage: {aml.operations.values('Stage')}''')
+for op in aml.operations.where(Success='false'):
+    print(f'''Failed Operation: {op['Name']}''')
+
 # Export AML as a clean dictionary
 amlDict = aml.toDict()
 
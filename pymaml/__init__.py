@@ -0,0 +1,3 @@
+from .compare import diff, iterDiff
+
+__all__ = ['diff', 'iterDiff']
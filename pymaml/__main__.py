@@ -1,5 +1,8 @@
-from sys import path, argv
-from os.path import dirname, realpath
+from sys import path, exit
+from os import makedirs
+from os.path import dirname, exists, realpath
+from time import perf_counter
+from argparse import ArgumentParser
 
 # correct the path to the root of the library
 root_path = dirname(dirname(realpath(__file__)))
@@ -7,34 +10,109 @@ path.insert(0, root_path)
 
 
 if __name__ == "__main__":
-    def printHelp():
-        print("Usage: python -m pymaml input.(aml|json) [output.(aml|json)]")
-        quit()
-
-    if len(argv) < 2:
-        printHelp()
-
-    conversions = {
-        # Master AML to simplified dictionary
-        'aml': 'json',
-
-        # Simpified dictionary to Master AML
-        'json': 'aml',
-    }
-
-    inputF = argv[1]
-    inputExt = inputF.split('.')[-1]
-    if inputExt not in conversions:
-        printHelp()
-
-    try:
-        outputF = argv[2]
-        if outputF.split('.')[-1] not in conversions:
-            printHelp()
-    except IndexError:
-        outputExt = conversions[inputExt]
-        outputF = inputF.replace(f'.{inputExt}', f'.{outputExt}')
-
-    print(f"Converting {inputF} to {outputF}")
-    from pymaml.master import MasterAML
-    MasterAML(inputF).export(outputF)
+    from pymaml.batch import (
+        CONVERSIONS, fileFormat, isPattern, outputPath, collectInputs,
+        convertAll)
+    from pymaml.compare import iterDiff, formatChange
+
+    parser = ArgumentParser(
+        prog='python -m pymaml',
+        description='Convert Master AML files to simplified JSON and back',
+        epilog='The single file form "input.(aml|json) output.(json|aml)" '
+               'is still supported, as well as "input.aml output.aml" when '
+               'the output does not exist yet. With --diff, the changes '
+               'from the first file to the second one are printed instead',
+    )
+    parser.add_argument(
+        'inputs', nargs='+',
+        help='input files, glob patterns or folders')
+    parser.add_argument(
+        '-o', '--output',
+        help='output folder, next to every input by default')
+    parser.add_argument(
+        '-t', '--to', choices=sorted(set(CONVERSIONS.values())),
+        help='output format, the opposite of every input by default')
+    parser.add_argument(
+        '-c', '--compact', action='store_true',
+        help='write JSON files without indentation')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of worker processes, all the CPUs by default')
+    parser.add_argument(
+        '-d', '--diff', action='store_true',
+        help='compare two AML/JSON files, exits with 1 if they differ')
+    args = parser.parse_args()
+
+    # Compare two files, printing every change as soon as it is found
+    if args.diff:
+        from pymaml.master import MasterAML
+
+        if len(args.inputs) != 2:
+            parser.error('--diff takes exactly two files')
+        for inputF in args.inputs:
+            if fileFormat(inputF) is None:
+                parser.error(f'unsupported input format: {inputF}')
+        a, b = (MasterAML(inputF) for inputF in args.inputs)
+        changes = 0
+        for change in iterDiff(a, b):
+            print(formatChange(change))
+            changes += 1
+        print(f'{changes} changes')
+        exit(1 if changes else 0)
+
+    # Single file form: input.aml output.json, or output.aml if it does
+    # not exist yet, otherwise both are converted
+    inputs = args.inputs
+    outputF = None
+    if len(inputs) == 2 and fileFormat(inputs[0]) and \
+       fileFormat(inputs[1]) and not isPattern(inputs[1]) and (
+           fileFormat(inputs[1]) == CONVERSIONS[fileFormat(inputs[0])] or
+           not exists(inputs[1])):
+        inputs, outputF = inputs[:1], inputs[1]
+
+    jobs = []
+    for inputF, root in collectInputs(inputs, target=args.to):
+        if fileFormat(inputF) is None:
+            parser.error(f'unsupported input format: {inputF}')
+        jobs.append((
+            inputF,
+            outputF or outputPath(
+                inputF, target=args.to, folder=args.output, root=root),
+        ))
+    if not jobs:
+        parser.error('no input files found')
+
+    # Never let two inputs overwrite the same output
+    outputs = {}
+    for inputF, outputF in jobs:
+        if outputF in outputs:
+            parser.error(
+                f'{outputs[outputF]} and {inputF} would both be converted '
+                f'to {outputF}')
+        outputs[outputF] = inputF
+
+    if args.output:
+        for outputF in outputs:
+            makedirs(dirname(outputF) or '.', exist_ok=True)
+
+    start = perf_counter()
+    failed = []
+    for i, (inputF, outputF, seconds, error) in enumerate(
+            convertAll(jobs, workers=args.jobs, compact=args.compact),
+            start=1):
+        progress = f'[{i}/{len(jobs)}]'
+        if error is None:
+            print(f'{progress} {inputF} -> {outputF} ({seconds:.2f} s)')
+        else:
+            print(f'{progress} FAILED {inputF}: {error}')
+            failed.append(inputF)
+
+    print(
+        f'Converted {len(jobs) - len(failed)} of {len(jobs)} files '
+        f'in {perf_counter() - start:.2f} s'
+    )
+    if failed:
+        print(f'{len(failed)} failed:')
+        for inputF in failed:
+            print(f'  {inputF}')
+        exit(1)
@@ -0,0 +1,386 @@
+import io
+import json
+from xml.etree import ElementTree
+
+import xmltodict
+
+from .reader import parseXMLD
+
+try:
+    from lxml import etree as lxmlTree
+except ImportError:
+    lxmlTree = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# XML declaration written by xmltodict.unparse
+DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+
+class MAMLXMLBackend():
+    '''
+    XML parser and serializer of AML files
+
+    Every backend parses into the same force_list XML dict expected by the
+    element classes, and serializes it with the pretty format of
+    xmltodict.unparse(pretty=True)
+    '''
+
+    name = None
+
+    # iterparse implementation used by the streaming reader
+    iterparse = staticmethod(ElementTree.iterparse)
+
+    @classmethod
+    def available(cls) -> bool:
+        ''' Check if the backend dependencies are installed '''
+        return True
+
+    def parse(self, stream) -> dict:
+        ''' Returns the XML dict of a binary stream '''
+        raise NotImplementedError
+
+    def unparse(self, xmld: dict, stream) -> None:
+        ''' Write an XML dict to a text stream '''
+        raise NotImplementedError
+
+
+class XMLToDictBackend(MAMLXMLBackend):
+    ''' Pure Python SAX backend, the reference implementation '''
+
+    name = 'xmltodict'
+
+    def parse(self, stream) -> dict:
+        return xmltodict.parse(stream, force_list=True)
+
+    def unparse(self, xmld: dict, stream) -> None:
+        xmltodict.unparse(xmld, output=stream, pretty=True)
+
+
+class ETreeBackend(MAMLXMLBackend):
+    '''
+    Standard library ElementTree backend
+
+    Parsing reuses the converters of MAMLReader, serialization builds an
+    element tree indented like xmltodict. Namespace declarations are
+    written before the rest of attributes, which are always double quoted
+    '''
+
+    name = 'etree'
+
+    def parse(self, stream) -> dict:
+        return parseXMLD(stream, parser=self.iterparse)
+
+    def unparse(self, xmld: dict, stream) -> None:
+        if len(xmld) != 1:
+            raise ValueError('Document must have exactly one root.')
+        (name, value), = xmld.items()
+        roots = list(self._build_(None, name, value, 0, {}))
+        if len(roots) != 1:
+            raise ValueError('document with multiple roots')
+        stream.write(DECLARATION)
+        stream.write(self._serialize_(roots[0]))
+
+    def _serialize_(self, root) -> str:
+        return ElementTree.tostring(
+            root, encoding='unicode', short_empty_elements=False)
+
+    def _element_(self, parent, name: str, attrs: dict, scope: dict):
+        ''' Create an element, names are kept as prefix:local '''
+        if parent is None:
+            return ElementTree.Element(name, attrs)
+        return ElementTree.SubElement(parent, name, attrs)
+
+    def _build_(self, parent, name: str, value, depth: int, scope: dict):
+        '''
+        Create the elements of an XML dict entry under parent
+
+        Yields the new elements, with their text and tails set to match
+        the xmltodict pretty format: children first, then the text
+        '''
+        if not isinstance(value, list):
+            value = [value]
+
+        for v in value:
+            if v is None:
+                v = {}
+            elif not isinstance(v, dict):
+                v = {'#text': toText(v)}
+
+            text = None
+            attrs = {}
+            children = []
+            for k, item in v.items():
+                if k == '#text':
+                    if isinstance(item, list):
+                        item = ''.join(toText(i) for i in item)
+                    text = toText(item)
+                elif k[0] == '@':
+                    if k == '@xmlns' and isinstance(item, dict):
+                        for prefix, uri in item.items():
+                            key = f'xmlns:{prefix}' if prefix else 'xmlns'
+                            attrs[key] = toText(uri)
+                    else:
+                        attrs[k[1:]] = toText(item)
+                else:
+                    children.append((k, item))
+
+            elem = self._element_(parent, name, attrs, scope)
+            if not children:
+                elem.text = text or ''
+                yield elem
+                continue
+
+            # Children on their own lines, then the text
+            elem.text = '\n' + '\t' * (depth + 1)
+            inner = self._scope_(attrs, scope)
+            last = None
+            for k, item in children:
+                for last in self._build_(elem, k, item, depth + 1, inner):
+                    last.tail = '\n' + '\t' * (depth + 1)
+            if last is None:
+                elem.text = '\n' + (text or '') + '\t' * depth
+            else:
+                last.tail = '\n' + (text or '') + '\t' * depth
+            yield elem
+
+    def _scope_(self, attrs: dict, scope: dict) -> dict:
+        ''' Returns the namespaces in scope of an element children '''
+        return scope
+
+
+class LXMLBackend(ETreeBackend):
+    ''' lxml backend, both parsing and serialization run in C '''
+
+    name = 'lxml'
+
+    iterparse = staticmethod(
+        lxmlTree.iterparse if lxmlTree is not None else None)
+
+    @classmethod
+    def available(cls) -> bool:
+        return lxmlTree is not None
+
+    def _serialize_(self, root) -> str:
+        return lxmlTree.tostring(root, encoding='unicode')
+
+    def _element_(self, parent, name: str, attrs: dict, scope: dict):
+        ''' Create an element, resolving the prefixes of the names '''
+        nsmap = {}
+        attrib = {}
+        for k, v in attrs.items():
+            if k == 'xmlns':
+                nsmap[None] = v
+            elif k.startswith('xmlns:'):
+                nsmap[k[6:]] = v
+            else:
+                attrib[k] = v
+        if nsmap:
+            scope = dict(scope)
+            scope.update(nsmap)
+
+        attrib = {
+            self._qualify_(k, scope, True): v for k, v in attrib.items()}
+        tag = self._qualify_(name, scope, False)
+        if parent is None:
+            return lxmlTree.Element(tag, attrib, nsmap=nsmap or None)
+        return lxmlTree.SubElement(parent, tag, attrib, nsmap=nsmap or None)
+
+    def _scope_(self, attrs: dict, scope: dict) -> dict:
+        declarations = {
+            None if k == 'xmlns' else k[6:]: v
+            for k, v in attrs.items()
+            if k == 'xmlns' or k.startswith('xmlns:')
+        }
+        if not declarations:
+            return scope
+        scope = dict(scope)
+        scope.update(declarations)
+        return scope
+
+    def _qualify_(self, name: str, scope: dict, attribute: bool) -> str:
+        ''' Translate prefix:name into {uri}name '''
+        prefix, _, local = name.rpartition(':')
+        if prefix == 'xml':
+            return f'{{{XML_NAMESPACE}}}{local}'
+        if prefix:
+            return f'{{{scope[prefix]}}}{local}'
+        if not attribute and scope.get(None):
+            return f'{{{scope[None]}}}{local}'
+        return name
+
+
+def toText(value) -> str:
+    ''' Convert an XML dict value to text like xmltodict '''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value if isinstance(value, str) else str(value)
+
+
+# Backends by name
+BACKENDS = {
+    backend.name: backend
+    for backend in [XMLToDictBackend, ETreeBackend, LXMLBackend]
+}
+
+DEFAULT_BACKEND = XMLToDictBackend.name
+
+
+def availableBackends() -> list:
+    ''' Returns the names of the backends which dependencies are installed '''
+    return [name for name, cls in BACKENDS.items() if cls.available()]
+
+
+def getBackend(backend=None) -> MAMLXMLBackend:
+    '''
+    Returns a backend instance from its name
+
+    :param backend: name of the backend, instance or None for the default
+    '''
+    if isinstance(backend, MAMLXMLBackend):
+        return backend
+    name = backend or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(
+            f'Unknown XML backend: {name}, use one of {list(BACKENDS)}')
+    if not BACKENDS[name].available():
+        raise ValueError(f'XML backend not installed: {name}')
+    return BACKENDS[name]()
+
+
+class MAMLJSONBackend():
+    '''
+    JSON parser and serializer of simplified dictionaries
+
+    Files are always read in binary mode. Backends producing bytes write
+    them as they are to binary streams and decoded to text streams
+    '''
+
+    name = None
+
+    @classmethod
+    def available(cls) -> bool:
+        ''' Check if the backend dependencies are installed '''
+        return True
+
+    def load(self, stream):
+        ''' Returns the object stored in a binary or text stream '''
+        raise NotImplementedError
+
+    def dump(self, obj, stream, compact: bool = False) -> None:
+        '''
+        Write an object to a stream
+
+        :param compact: skip the indentation and spaces to reduce the size
+        '''
+        raise NotImplementedError
+
+
+class StdlibJSONBackend(MAMLJSONBackend):
+    ''' Standard library json, written chunk by chunk '''
+
+    name = 'json'
+
+    def load(self, stream):
+        return json.load(stream)
+
+    def dump(self, obj, stream, compact: bool = False) -> None:
+        if compact:
+            encoder = json.JSONEncoder(separators=(',', ':'))
+        else:
+            encoder = json.JSONEncoder(indent=2)
+        if isinstance(stream, io.TextIOBase):
+            for chunk in encoder.iterencode(obj):
+                stream.write(chunk)
+            return
+
+        # Encode the chunks through a buffered text layer
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            for chunk in encoder.iterencode(obj):
+                text.write(chunk)
+        finally:
+            text.detach()
+
+
+class OrjsonBackend(MAMLJSONBackend):
+    ''' orjson, the whole document is serialized at once in C '''
+
+    name = 'orjson'
+
+    @classmethod
+    def available(cls) -> bool:
+        return orjson is not None
+
+    def load(self, stream):
+        return orjson.loads(stream.read())
+
+    def dump(self, obj, stream, compact: bool = False) -> None:
+        data = orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2)
+        if isinstance(stream, io.TextIOBase):
+            data = data.decode('utf-8')
+        stream.write(data)
+
+
+class UjsonBackend(MAMLJSONBackend):
+    ''' ujson, the whole document is serialized at once in C '''
+
+    name = 'ujson'
+
+    @classmethod
+    def available(cls) -> bool:
+        return ujson is not None
+
+    def load(self, stream):
+        return ujson.loads(stream.read())
+
+    def dump(self, obj, stream, compact: bool = False) -> None:
+        data = ujson.dumps(obj, indent=0 if compact else 2)
+        if not isinstance(stream, io.TextIOBase):
+            data = data.encode('utf-8')
+        stream.write(data)
+
+
+# JSON backends by name, by order of preference
+JSON_BACKENDS = {
+    backend.name: backend
+    for backend in [OrjsonBackend, UjsonBackend, StdlibJSONBackend]
+}
+
+
+# Standard library json, the output of the others may differ slightly,
+# e.g. non-ASCII characters written as they are instead of escaped
+DEFAULT_JSON_BACKEND = StdlibJSONBackend.name
+
+
+def availableJSONBackends() -> list:
+    ''' Returns the names of the JSON backends installed, fastest first '''
+    return [name for name, cls in JSON_BACKENDS.items() if cls.available()]
+
+
+def getJSONBackend(backend=None) -> MAMLJSONBackend:
+    '''
+    Returns a JSON backend instance from its name
+
+    :param backend: name of the backend, instance or None for the default
+    '''
+    if isinstance(backend, MAMLJSONBackend):
+        return backend
+    name = backend or DEFAULT_JSON_BACKEND
+    if name not in JSON_BACKENDS:
+        raise ValueError(
+            f'Unknown JSON backend: {name}, use one of {list(JSON_BACKENDS)}')
+    if not JSON_BACKENDS[name].available():
+        raise ValueError(f'JSON backend not installed: {name}')
+    return JSON_BACKENDS[name]()
@@ -0,0 +1,137 @@
+import os
+from glob import glob
+from os.path import basename, dirname, isdir, join, relpath
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+# Conversion target of every supported input format
+CONVERSIONS = {
+    # Master AML to simplified dictionary
+    'aml': 'json',
+
+    # Simpified dictionary to Master AML
+    'json': 'aml',
+}
+
+
+def fileFormat(filePath: str) -> str:
+    ''' Returns the format (aml/json) of a file path or None '''
+    name = filePath.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    ext = name.rsplit('.', 1)[-1]
+    return ext if ext in CONVERSIONS else None
+
+
+def outputPath(
+    inputF: str,
+    target: str = None,
+    folder: str = None,
+    root: str = None,
+) -> str:
+    '''
+    Returns the output path of an input file
+
+    :param target: output format, the opposite of the input by default
+    :param folder: output folder, the input folder by default
+    :param root: folder the input was found in, its path relative to it is
+        kept in the output folder, only its name is kept if None
+    '''
+    inputExt = fileFormat(inputF)
+    target = target or CONVERSIONS[inputExt]
+    name = inputF[:-3] if inputF.lower().endswith('.gz') else inputF
+    outputF = name[:len(name) - len(inputExt)] + target
+    if folder is not None:
+        if root is None:
+            outputF = join(folder, basename(outputF))
+        else:
+            outputF = join(folder, relpath(outputF, root))
+    return outputF
+
+
+def collectInputs(patterns: list, target: str = None) -> list:
+    '''
+    Expand files, glob patterns and folders into the list of input files
+
+    Folders are searched recursively for the files to be converted into
+    target, AML files if no target is given
+
+    Returns a list of (input file, root) where root is the folder or the
+    glob pattern folder the file was found in, None for single files
+    '''
+    sources = [k for k, v in CONVERSIONS.items() if v == (target or 'json')]
+    inputs = {}
+    for pattern in patterns:
+        if isdir(pattern):
+            for ext in sources:
+                for gz in ['', '.gz']:
+                    for inputF in sorted(glob(
+                            join(pattern, '**', f'*.{ext}{gz}'),
+                            recursive=True)):
+                        inputs.setdefault(inputF, pattern)
+        elif isPattern(pattern):
+            root = pattern
+            while isPattern(root):
+                root = dirname(root)
+            for inputF in sorted(glob(pattern, recursive=True)):
+                inputs.setdefault(inputF, root)
+        else:
+            inputs.setdefault(pattern, None)
+
+    # Without duplicates, keeping the order
+    return list(inputs.items())
+
+
+def isPattern(path: str) -> bool:
+    ''' Returns True if a path is a glob pattern '''
+    return any(c in path for c in '*?[')
+
+
+def convertFile(inputF: str, outputF: str, compact: bool = False) -> tuple:
+    '''
+    Convert a single file, never raising
+
+    Set compact to write JSON files without indentation
+
+    Returns the input and output paths, the elapsed seconds and the error
+    message if failed
+    '''
+    start = perf_counter()
+    try:
+        from .master import MasterAML
+        MasterAML(inputF).export(outputF, compact=compact)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return inputF, outputF, perf_counter() - start, error
+
+
+def convertAll(jobs: list, workers: int = None, compact: bool = False):
+    '''
+    Convert a list of (input, output) paths across a process pool
+
+    Yields the result of convertFile for every job as soon as it finishes.
+    A single worker converts the files in the current process.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(jobs) <= 1:
+        for inputF, outputF in jobs:
+            yield convertFile(inputF, outputF, compact)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convertFile, inputF, outputF, compact):
+                (inputF, outputF)
+            for inputF, outputF in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # The worker itself died (BrokenProcessPool, pickling...)
+                inputF, outputF = futures[future]
+                yield inputF, outputF, 0.0, f'{type(e).__name__}: {e}'
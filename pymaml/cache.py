@@ -0,0 +1,203 @@
+import os
+from hashlib import sha256
+from os.path import abspath, basename, join
+from tempfile import mkstemp
+
+from .snapshot import dumpSnapshot, loadSnapshot
+
+
+class MAMLCache():
+    '''
+    On-disk cache of decoded documents, stored as snapshots
+
+    Entries are keyed by the sha256 of the input file content. The hash of
+    every file is remembered by its path, size and modification time, so
+    unchanged files are not read again to be hashed. Writes are atomic,
+    so several processes can share the same folder, and the least
+    recently used entries are evicted once the total size exceeds maxSize,
+    counting the remembered hashes too
+    '''
+
+    def __init__(self, folder: str, maxSize: int = 2**30) -> None:
+        self.folder = folder
+        self.maxSize = maxSize
+
+        # Counters of the current process
+        self.hits = 0
+        self.misses = 0
+
+        # Content hash of the files by path, size and modification time
+        self.statFolder = join(self.folder, 'stat')
+        os.makedirs(self.statFolder, exist_ok=True)
+
+    def key(self, filePath: str) -> str:
+        ''' Returns the content hash of a file '''
+        st = os.stat(filePath)
+        statKey = sha256(
+            f'{abspath(filePath)}|{st.st_size}|{st.st_mtime_ns}'.encode()
+        ).hexdigest()
+        statPath = join(self.statFolder, statKey)
+
+        # Fast path: file unchanged since hashed
+        try:
+            with open(statPath, mode='r') as f:
+                key = f.read()
+            if len(key) == 64:
+                # Mark as recently used
+                os.utime(statPath)
+                return key
+        except OSError:
+            pass
+
+        h = sha256()
+        with open(filePath, mode='rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                h.update(chunk)
+        key = h.hexdigest()
+        self._write_(statPath, lambda f: f.write(key.encode()))
+        return key
+
+    def path(self, key: str, variant: str = '') -> str:
+        ''' Returns the path of the snapshot of an entry '''
+        return join(self.folder, f'{key}{variant}.snapshot')
+
+    def load(self, filePath: str, doc, variant: str = '') -> bool:
+        '''
+        Restore the cached snapshot of a file into doc
+
+        Returns False on a miss. Stale or corrupted snapshots are removed
+
+        :param variant: suffix telling apart the documents decoded from
+            the same file with different options
+        '''
+        try:
+            path = self.path(self.key(filePath), variant)
+        except (OSError, ValueError):
+            self.misses += 1
+            return False
+        try:
+            with open(path, mode='rb') as f:
+                loadSnapshot(f, doc)
+        except OSError:
+            self.misses += 1
+            return False
+        except ValueError:
+            self.misses += 1
+            self._remove_(path)
+            return False
+
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def save(self, filePath: str, doc, variant: str = '') -> None:
+        ''' Store the snapshot of the document decoded from a file '''
+        path = self.path(self.key(filePath), variant)
+        self._write_(path, lambda f: dumpSnapshot(doc, f))
+        self.evict()
+
+    def evict(self) -> None:
+        '''
+        Remove the least recently used entries exceeding maxSize
+
+        Snapshots and remembered hashes are evicted together, then the
+        hashes of the files without any snapshot left are removed
+        '''
+        snapshots = self._entries_(self.folder, '.snapshot')
+        hashes = self._entries_(self.statFolder)
+
+        total = sum(size for _, size, _ in snapshots + hashes)
+        removed = set()
+        for _, size, path in sorted(snapshots + hashes):
+            if total <= self.maxSize:
+                break
+            self._remove_(path)
+            removed.add(path)
+            total -= size
+        if not removed:
+            return
+
+        # Keys of the snapshots left, whatever their variant
+        keys = {
+            basename(path)[:64]
+            for _, _, path in snapshots
+            if path not in removed
+        }
+        for _, _, path in hashes:
+            if path in removed:
+                continue
+            try:
+                with open(path, mode='r') as f:
+                    key = f.read()
+            except OSError:
+                continue
+            if key not in keys:
+                self._remove_(path)
+
+    def clear(self) -> None:
+        ''' Remove every entry '''
+        for folder in [self.folder, self.statFolder]:
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    self._remove_(entry.path)
+
+    def stats(self) -> dict:
+        ''' Returns the hit and miss counters and the cache size '''
+        snapshots = self._entries_(self.folder, '.snapshot')
+        hashes = self._entries_(self.statFolder)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(snapshots),
+            'size': sum(size for _, size, _ in snapshots + hashes),
+        }
+
+    @staticmethod
+    def _entries_(folder: str, suffix: str = '') -> list:
+        ''' Returns the (mtime, size, path) of the files of a folder '''
+        entries = []
+        for entry in os.scandir(folder):
+            if not entry.name.endswith(suffix) or not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        return entries
+
+    def _write_(self, path: str, write) -> None:
+        ''' Write a file atomically through a temporary file '''
+        fd, tmp = mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode='wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            self._remove_(tmp)
+            raise
+
+    def _remove_(self, path: str) -> None:
+        ''' Remove a file, ignoring the ones removed by other processes '''
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Caches by folder, sharing their counters within the process
+_caches_ = {}
+
+
+def getCache(folder: str, maxSize: int = None) -> MAMLCache:
+    ''' Returns the cache of a folder, created on first use '''
+    key = abspath(folder)
+    if key not in _caches_:
+        _caches_[key] = MAMLCache(folder)
+    if maxSize is not None:
+        _caches_[key].maxSize = maxSize
+    return _caches_[key]
@@ -0,0 +1,135 @@
+# Element lists of the Digital Threads and the kind of their elements
+ELEMENTS = {
+    'Operations': 'Operation',
+    'Files': 'File',
+    'Softwares': 'Software',
+}
+
+# Fields holding the IDs of linked elements, by element kind
+LINKS = {
+    'Operation': ('InputFile', 'OutputFile', 'SoftwareUsed'),
+    'Software': ('ConfigFile',),
+}
+
+
+def diff(a, b) -> list:
+    '''
+    Returns the differences from the document a to the document b
+
+    See iterDiff() for the changes, a and b are MasterAML instances or
+    their simplified dictionaries
+    '''
+    return list(iterDiff(a, b))
+
+
+def iterDiff(a, b):
+    '''
+    Yield the differences from the document a to the document b
+
+    Digital Threads, Operations, Files and Softwares are matched by ID with
+    dictionaries, so every element is visited once and equal elements are
+    skipped with a single comparison. Every change is a tuple:
+
+        (change, kind, ID, field, old, new)
+
+    change is one of:
+        'added', 'removed': element of kind (Digital Thread, Operation,
+            File or Software), the elements of a new or removed Digital
+            Thread are not listed
+        'changed': field of the element, nested fields are joined with
+            dots (e.g. UserInfo.Timestamp, Files.0.File.Name), the document
+            fields have no kind nor ID
+        'linked', 'unlinked': ID added to or removed from a link field
+            (e.g. InputFile), in new or old respectively
+    '''
+    yield from _fields_(None, None, a, b, skip=('Digital Threads',))
+
+    threadsA = {dt['ID']: dt for dt in a['Digital Threads']}
+    threadsB = {dt['ID']: dt for dt in b['Digital Threads']}
+    for ID, dtA in threadsA.items():
+        dtB = threadsB.get(ID)
+        if dtB is None:
+            yield 'removed', 'Digital Thread', ID, None, dtA, None
+        else:
+            yield from _thread_(dtA, dtB)
+    for ID, dtB in threadsB.items():
+        if ID not in threadsA:
+            yield 'added', 'Digital Thread', ID, None, None, dtB
+
+
+def formatChange(change: tuple) -> str:
+    ''' Returns a change of iterDiff() as a line of text '''
+    change, kind, ID, field, old, new = change
+    element = f'{kind} {ID}' if kind else 'Document'
+    if change == 'added':
+        return f'+ {element} {new.get("Name")!r}'
+    elif change == 'removed':
+        return f'- {element} {old.get("Name")!r}'
+    elif change == 'linked':
+        return f'+ {element} {field}: {new}'
+    elif change == 'unlinked':
+        return f'- {element} {field}: {old}'
+    return f'~ {element} {field}: {old!r} -> {new!r}'
+
+
+def _thread_(a: dict, b: dict):
+    ''' Yield the differences between two versions of a Digital Thread '''
+    if a == b:
+        return
+    skip = ('ID',) + tuple(ELEMENTS)
+    yield from _fields_('Digital Thread', a['ID'], a, b, skip=skip)
+
+    for key, kind in ELEMENTS.items():
+        elementsA = {element['ID']: element for element in a.get(key, [])}
+        elementsB = {element['ID']: element for element in b.get(key, [])}
+        for ID, elementA in elementsA.items():
+            elementB = elementsB.get(ID)
+            if elementB is None:
+                yield 'removed', kind, ID, None, elementA, None
+            elif elementA != elementB:
+                yield from _element_(kind, ID, elementA, elementB)
+        for ID, elementB in elementsB.items():
+            if ID not in elementsA:
+                yield 'added', kind, ID, None, None, elementB
+
+
+def _element_(kind: str, ID: str, a: dict, b: dict):
+    ''' Yield the differences between two versions of an element '''
+    links = LINKS.get(kind, ())
+    yield from _fields_(kind, ID, a, b, skip=('ID',) + links)
+    for field in links:
+        old = a.get(field) or []
+        new = b.get(field) or []
+        if old == new:
+            continue
+        oldIDs = set(old)
+        newIDs = set(new)
+        for target in old:
+            if target not in newIDs:
+                yield 'unlinked', kind, ID, field, target, None
+        for target in new:
+            if target not in oldIDs:
+                yield 'linked', kind, ID, field, None, target
+
+
+def _fields_(kind, ID, a: dict, b: dict, skip=(), prefix=''):
+    '''
+    Yield the changed fields of two dicts, recursing into dicts and into
+    lists of the same length, whose items are numbered (e.g. Files.0.File)
+    '''
+    for field in {**a, **b}:
+        if field in skip:
+            continue
+        old = a.get(field)
+        new = b.get(field)
+        if old == new:
+            continue
+        if isinstance(old, dict) and isinstance(new, dict):
+            yield from _fields_(kind, ID, old, new, prefix=f'{prefix}{field}.')
+        elif isinstance(old, list) and isinstance(new, list) and \
+                len(old) == len(new):
+            yield from _fields_(
+                kind, ID, dict(enumerate(old)), dict(enumerate(new)),
+                prefix=f'{prefix}{field}.')
+        else:
+            yield 'changed', kind, ID, f'{prefix}{field}', old, new
@@ -1,7 +1,10 @@
 import json
-from copy import deepcopy
+import copyreg
 from abc import abstractmethod
 
+from .templates import XMLDTemplates, compileTemplate
+from .tracked import track
+
 
 class MAMLBaseElement(dict):
 
@@ -18,6 +21,17 @@ class MAMLBaseElement(dict):
     # List of Attribute tags to load its Value
     _ATTRIBUTES_TAG_ = []
 
+    # Current Digital Thread
+    dt = None
+
+    # Modified since decoded from the XML dict, new elements are always dirty
+    dirty = True
+
+    def __init_subclass__(cls, **kargs) -> None:
+        ''' Compile the constructor of the default template of every class '''
+        super().__init_subclass__(**kargs)
+        cls._newTemplate_ = staticmethod(compileTemplate(cls._TEMPLATE_))
+
     def __init__(
         self,
         # Master AML Document
@@ -36,30 +50,118 @@ class MAMLBaseElement(dict):
         if DigitalThread is not None:
             self.dt = DigitalThread
 
-        # Initialize dictionary
-        super().__init__()
-        self.clear()
-
-        # Load from XML dict if provided
-        if inputXMLD is not None:
-            self._decode_(inputXMLD)
-        else:
-            # Load XML dict template
-            self.xmld = self._loadXMLDtemplate()
-
-        # Load from the Simplified Dict if provided
-        if inputXMLD is None and inputSimpleDict is not None:
-            super().update(inputSimpleDict)
-
-        self._registerSelfIDs_()
-
-    def clear(self) -> None:
-        ''' Overload to initialize Simplified Dict with default template '''
+        # Elements created while decoding this one are nested in it
+        self.doc._nesting_ += 1
+        try:
+            # Initialize dictionary
+            super().__init__()
+
+            # Load from XML dict if provided, which clears the dictionary
+            if inputXMLD is not None:
+                self._decode_(inputXMLD)
+                self._track_()
+            else:
+                self.clear()
+
+                # Load XML dict template
+                self.xmld = self._loadXMLDtemplate()
+
+            # Load from the Simplified Dict if provided
+            if inputXMLD is None and inputSimpleDict is not None:
+                super().update(inputSimpleDict)
+        finally:
+            self.doc._nesting_ -= 1
+
+        # Only the outermost element registers the IDs, its walk already
+        # covers the subtrees of the nested ones
+        if not self.doc._nesting_:
+            self._registerSelfIDs_()
+
+    def __setitem__(self, key, value) -> None:
+        ''' Overload to track changes and keep the ID index up to date '''
+        if key == 'ID':
+            self.doc._reindexID_(self, self.get('ID'), value)
+        self._touch_()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self._touch_()
+        super().__delitem__(key)
+
+    def update(self, *args, **kargs) -> None:
+        self._touch_()
+        super().update(*args, **kargs)
+
+    def pop(self, key, *default):
+        self._touch_()
+        return super().pop(key, *default)
+
+    def popitem(self) -> tuple:
+        ''' Overload to pop the last item through pop() '''
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = next(reversed(self.keys()))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        ''' Overload to set missing items through __setitem__() '''
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __ior__(self, other):
+        self._touch_()
+        return super().__ior__(other)
+
+    def __reduce_ex__(self, protocol):
+        ''' Pickle support: restore the attributes before the items '''
+        return (copyreg.__newobj__, (type(self),), (self.__dict__, dict(self)))
+
+    def __setstate__(self, state) -> None:
+        attrs, items = state
+        self.__dict__.update(attrs)
+        dict.update(self, items)
+
+    def _touch_(self) -> None:
+        ''' Mark the element and its Digital Thread as modified '''
+        if self.dirty:
+            return
+        self.dirty = True
+        if self.dt is not None:
+            self.dt._touch_()
+
+    def _adding_(self, items: list) -> None:
+        ''' Called before items are added to one of its tracked lists '''
+        pass
+
+    def _removing_(self, items: list) -> None:
+        ''' Called before items are removed from one of its tracked lists '''
+        pass
+
+    def _track_(self) -> None:
+        '''
+        Start tracking changes once decoded
+
+        Nested lists and dicts are replaced by tracked versions, so changes
+        such as appending an ID to a list also mark the element as dirty
+        '''
+        for key, value in self.items():
+            tracked = track(self, value)
+            if tracked is not value:
+                super().__setitem__(key, tracked)
+        self.dirty = False
+
+    def clear(self, newID: bool = True) -> None:
+        '''
+        Overload to initialize Simplified Dict with default template
+
+        :param newID: generate a new ID, unless it is loaded afterwards
+        '''
         super().clear()
-        super().update(deepcopy(self._TEMPLATE_))
+        super().update(self._newTemplate_())
 
         # Initialize own ID
-        if 'ID' in self and self['ID'] is None:
+        if newID and 'ID' in self and self['ID'] is None:
             self['ID'] = self.doc.generateID()
 
     @abstractmethod
@@ -68,8 +170,8 @@ class MAMLBaseElement(dict):
         # Store XMLD input
         self.xmld = xmld
 
-        # Reset Simplified Dictionary
-        self.clear()
+        # Reset Simplified Dictionary, the ID is loaded from the XML dict
+        self.clear(newID=False)
 
         # Load XML attributes
         for attr in self._ATTRIBUTES_XML_:
@@ -78,6 +180,10 @@ class MAMLBaseElement(dict):
             except KeyError:
                 continue
 
+        # Initialize own ID if missing in the XML dict
+        if 'ID' in self and self['ID'] is None:
+            self['ID'] = self.doc.generateID()
+
         # Load Attribute tags
         try:
             for attr in self.xmld['Attribute']:
@@ -166,11 +272,7 @@ class MAMLBaseElement(dict):
 
     def _loadXMLDtemplate(self) -> dict:
         ''' Load default XML Dict template '''
-        try:
-            template = __file__.replace('base.py', self._TEMPLATE_XMLD_)
-            return json.load(open(template, mode='r'))
-        except:
-            return {}
+        return XMLDTemplates.get(self._TEMPLATE_XMLD_)
 
     def _fromRAW_(self, filePath: str) -> None:
         ''' Import raw XML dict from a JSON file, useful during development'''
@@ -182,29 +284,64 @@ class MAMLBaseElement(dict):
 
     def _registerSelfIDs_(self):
         ''' Register all the IDs '''
-        for id, _ in findkey(self.xmld, '@ID'):
-            self.doc.registerID(id)
-        for id, _ in findkey(self, 'ID'):
-            self.doc.registerID(id)
+        self.doc.registerIDs(
+            id for _, id, _ in findkeys([self.xmld, self], ('@ID', 'ID')))
 
     def findByID(self, ID: str) -> dict:
         ''' Search for an element by its ID (high level API) '''
-        return findUniqueKeys(self.doc, 'ID')[ID]
+        return self.doc._findByID_(ID)
 
 
 # Extra methods
-def findkey(var, key):
+def findkeys(var, keys):
+    '''
+    Find every occurrence of several keys in nested dicts and lists
+
+    Yields (key, value, parent dict) in depth-first order, the same order
+    as a recursive search, using an explicit stack instead of nested
+    generators: every result is yielded directly, whatever its depth, and
+    deep hierarchies never reach the recursion limit
+
+    :param var: dict or list to search
+    :param keys: collection of the keys to find
+    '''
+    stack = []
     if hasattr(var, 'items'):
-        for k, v in var.items():
-            if k == key:
-                yield v, var
+        stack.append((var, iter(var.items())))
+    elif isinstance(var, list):
+        stack.append((None, list.__iter__(var)))
+
+    while stack:
+        parent, items = stack[-1]
+
+        if parent is None:
+            # List: descend into the next dict
+            # Skip the elements still pending to be decoded
+            for d in items:
+                if hasattr(d, 'items'):
+                    stack.append((d, iter(d.items())))
+                    break
+            else:
+                stack.pop()
+            continue
+
+        for k, v in items:
+            if k in keys:
+                yield k, v, parent
             if isinstance(v, dict):
-                for result in findkey(v, key):
-                    yield result
+                stack.append((v, iter(v.items())))
+                break
             elif isinstance(v, list):
-                for d in v:
-                    for result in findkey(d, key):
-                        yield result
+                stack.append((None, list.__iter__(v)))
+                break
+        else:
+            stack.pop()
+
+
+def findkey(var, key):
+    ''' Find every occurrence of a key, yields (value, parent dict) '''
+    for _, v, parent in findkeys(var, (key,)):
+        yield v, parent
 
 
 def findUniqueKeys(var, key) -> dict:
@@ -1,8 +1,13 @@
 import json
 from copy import deepcopy
-from .base import MAMLBaseElement, findkey
+from .base import MAMLBaseElement, findkey, findkeys
 from .dt import MAMLDigitalThread
+from .lazy import MAMLLazyList, _pending_
+from .tracked import MAMLTrackedList
 from .libs.operations import MAMLOperationsLib
+from ..reader import MAMLReader
+from ..parallel import MAMLProcessPool
+from ..query import MAMLOperationIndex, MAMLTimeline
 
 
 class MAMLDocument(MAMLBaseElement):
@@ -20,15 +25,77 @@ class MAMLDocument(MAMLBaseElement):
     _ATTRIBUTES_XML_ = []
     _ATTRIBUTES_TAG_ = []
 
+    # Decode the Digital Threads elements on first access
+    lazy = False
+
+    # Number of processes decoding and encoding Digital Threads
+    workers = None
+
+    # Number of elements being created, see MAMLBaseElement.__init__
+    _nesting_ = 0
+
+    # Indexes of the Operations by their fields and by their timestamps,
+    # built on the first query
+    _operations_ = None
+    _timeline_ = None
+
+    # Elements may be missing from the ID index, see _findByID_
+    _staleIDs_ = False
+
     def __init__(self, *args, **kargs):
         ''' Overload init to load libraries '''
+        # Index of the elements by their ID
+        self.IDIndex = {}
+        self._duplicatedIDs_ = set()
+        self._staleIDs_ = False
+        self._operations_ = None
+        self._timeline_ = None
+
         super().__init__(*args, **kargs)
 
-        # Load the Operations library
-        self.OperationsLib = MAMLOperationsLib(Document=self)
+        # Load the Operations library, its IDs are already registered as
+        # part of the document XML dict
+        self._loadOperationsLib_()
+
+    def __setitem__(self, key, value) -> None:
+        ''' Overload to track the Digital Threads added and removed '''
+        if key == 'Digital Threads':
+            if type(value) is list:
+                value = MAMLTrackedList(self, value)
+            self._staleIDs_ = True
+            self._staleOperations_()
+        super().__setitem__(key, value)
+
+    def clear(self, newID: bool = True) -> None:
+        ''' Overload to track the Digital Threads added and removed '''
+        super().clear(newID)
+        dict.__setitem__(
+            self, 'Digital Threads',
+            MAMLTrackedList(self, self['Digital Threads']))
+
+    def _adding_(self, items: list) -> None:
+        ''' Digital Threads not added by newDigitalThread() are not indexed '''
+        if items is self.get('Digital Threads'):
+            self._staleIDs_ = True
+
+    def _removing_(self, items: list) -> None:
+        ''' Operations of removed Digital Threads leave the query indexes '''
+        if items is self.get('Digital Threads'):
+            self._staleOperations_()
+
+    def _loadOperationsLib_(self) -> None:
+        ''' Load the Operations library of the XML dict '''
+        self._nesting_ += 1
+        try:
+            self.OperationsLib = MAMLOperationsLib(Document=self)
+        finally:
+            self._nesting_ -= 1
 
     def _decode_(self, xmld) -> None:
         ''' Load the simplified representation from an XML dictionary '''
+        if isinstance(xmld, MAMLReader):
+            return self._decodeStream_(xmld)
+
         # Store XMLD input
         self.xmld = xmld
 
@@ -47,17 +114,92 @@ class MAMLDocument(MAMLBaseElement):
         self.ih = self.xmld['CAEXFile'][0]['InstanceHierarchy'][0]
 
         # Load Digital Threads
-        if 'InternalElement' in self.ih:
-            for ie in self.ih['InternalElement']:
-                if '@RefBaseSystemUnitPath' in ie and \
-                   ie['@RefBaseSystemUnitPath'] == "Structures/DigitalThread":
-                    self['Digital Threads'].append(
-                        MAMLDigitalThread(Document=self, inputXMLD=ie))
+        ies = [
+            ie for ie in self.ih.get('InternalElement', [])
+            if self._isDigitalThread_(ie)
+        ]
+        pool = self._processPool_(len(ies))
+        if pool is None:
+            for ie in ies:
+                self._decodeInternalElement_(ie)
+        else:
+            dts = list(pool.decode(ies))
+            self['Digital Threads'].extend(dts)
+
+            # The workers decode copies of the XML dicts, keep only those
+            decoded = {id(ie): dt.xmld for ie, dt in zip(ies, dts)}
+            self.ih['InternalElement'][:] = [
+                decoded.get(id(ie), ie)
+                for ie in self.ih['InternalElement']
+            ]
 
-        self._registerSelfIDs_()
+    def _decodeStream_(self, reader: MAMLReader) -> None:
+        '''
+        Load the simplified representation from an incremental reader
+
+        Digital Threads are decoded one at a time while the file is parsed,
+        their XML dicts are kept in the document one like a normal load
+        '''
+        # Reset Simplified Dictionary
+        self.clear()
+
+        # Load Digital Threads of the first InstanceHierarchy
+        for ie in reader:
+            if reader.hierarchy != 0:
+                continue
+            self._fixXMLDNullIDs_(ie)
+            self._decodeInternalElement_(ie)
+
+        # Store XMLD, complete once the whole file is parsed
+        self.xmld = reader.xmld
+        caex = self.xmld['CAEXFile'][0]
+        for key, value in caex.items():
+            if key != 'InstanceHierarchy':
+                self._fixXMLDNullIDs_({key: value})
+
+        # Load FileName
+        try:
+            self['FileName'] = caex['@FileName']
+        except KeyError:
+            pass
+
+        # Save direct accesses first
+        self.ih = caex['InstanceHierarchy'][0]
+
+    def _decodeInternalElement_(self, ie: dict) -> None:
+        ''' Load an InstanceHierarchy InternalElement if it is supported '''
+        if self._isDigitalThread_(ie):
+            self['Digital Threads'].append(
+                MAMLDigitalThread(Document=self, inputXMLD=ie))
+
+    def _isDigitalThread_(self, ie: dict) -> bool:
+        ''' Check if an InstanceHierarchy InternalElement is supported '''
+        return '@RefBaseSystemUnitPath' in ie and \
+            ie['@RefBaseSystemUnitPath'] == "Structures/DigitalThread"
+
+    def _processPool_(self, n: int) -> MAMLProcessPool:
+        ''' Returns a process pool to handle n Digital Threads or None '''
+        if not self.workers or self.workers < 2 or n < 2:
+            return None
+        if getattr(self, 'replicableIDs', False):
+            # Replicable IDs depend on the order they are generated
+            return None
+        return MAMLProcessPool(self, min(self.workers, n))
 
     def _encode_(self) -> dict:
         ''' Export the simplified representation to an XML dictionary '''
+        self._encodeHeader_()
+
+        # Save direct accesses first
+        ih = self.xmld['CAEXFile'][0]['InstanceHierarchy'][0]
+
+        for xmld in self._encodeDigitalThreads_():
+            ih['InternalElement'].append(xmld)
+
+        return self.xmld
+
+    def _encodeHeader_(self) -> dict:
+        ''' Export the XML dictionary without any Digital Thread '''
         super()._encode_()
 
         # Load FileName
@@ -66,23 +208,184 @@ class MAMLDocument(MAMLBaseElement):
         except (KeyError, IndexError):
             pass
 
-        # Save direct accesses first
-        ih = self.xmld['CAEXFile'][0]['InstanceHierarchy'][0]
-
-        for dt in self['Digital Threads']:
-            ih['InternalElement'].append(
-                MAMLDigitalThread(
-                    Document=self, inputSimpleDict=dt)._encode_())
-
         self._fixXMLDNullIDs_()
 
         return self.xmld
 
-    def _fixXMLDNullIDs_(self) -> None:
-        ''' Make sure IDs in the XMLD are not null '''
-        for id, parent in findkey(self.xmld, '@ID'):
+    def _encodeDigitalThreads_(self):
+        ''' Export the Digital Threads to XML dictionaries one at a time '''
+        dts = self['Digital Threads']
+        modified = [
+            dt for dt in dts
+            if not isinstance(dt, MAMLDigitalThread) or dt.dirty
+        ]
+        pool = self._processPool_(len(modified))
+        if pool is None:
+            for dt in dts:
+                yield self._encodeDigitalThread_(dt)
+            return
+
+        encoded = pool.encode(modified, self._encodeDigitalThread_)
+        try:
+            for dt in dts:
+                if isinstance(dt, MAMLDigitalThread) and not dt.dirty:
+                    yield dt.xmld
+                else:
+                    yield next(encoded)
+        finally:
+            encoded.close()
+
+    def _encodeDigitalThread_(self, dt: dict) -> dict:
+        ''' Export a Digital Thread to an XML dictionary '''
+        if isinstance(dt, MAMLDigitalThread) and not dt.dirty:
+            # Not modified since decoded
+            return dt.xmld
+        xmld = MAMLDigitalThread(Document=self, inputSimpleDict=dt)._encode_()
+        self._fixXMLDNullIDs_(xmld)
+        return xmld
+
+    def _fixXMLDNullIDs_(self, xmld: dict = None) -> None:
+        '''
+        Make sure IDs in the XMLD (or a subtree of it) are not null
+
+        The IDs already in it are registered first, as while loading they
+        are only registered once the document is decoded, and the new IDs
+        must not collide with them
+        '''
+        if xmld is None:
+            xmld = self.xmld
+        nulls = []
+        IDs = []
+        for id, parent in findkey(xmld, '@ID'):
             if id is None or str(id).lower() == 'none':
-                parent['@ID'] = self.doc.generateID()
+                nulls.append(parent)
+            else:
+                IDs.append(id)
+        if not nulls:
+            return
+        self.doc.registerIDs(IDs)
+        for parent, id in zip(nulls, self.doc.generateIDs(len(nulls))):
+            parent['@ID'] = id
+
+    def _registerSelfIDs_(self) -> None:
+        '''
+        Register and index all the IDs of the document
+
+        Called once the whole document is decoded, in a single pass over
+        the XML dict and the simplified dict
+        '''
+        self._indexIDs_(register=True)
+
+    def _indexIDs_(self, register=False) -> None:
+        '''
+        Rebuild the index of the elements by their ID
+
+        If register, the IDs of the XML dict and simplified dict are also
+        registered during the same walk
+        '''
+        self.IDIndex = {}
+        self._duplicatedIDs_ = set()
+        self._staleIDs_ = False
+        IDs = []
+        if register:
+            walk = findkeys([self.xmld, self], ('@ID', 'ID'))
+        else:
+            walk = findkeys(self, ('ID',))
+        for key, id, element in walk:
+            if register:
+                IDs.append(id)
+            if key != 'ID':
+                continue
+            if id in self.IDIndex:
+                self._duplicatedIDs_.add(id)
+            self.IDIndex[id] = element
+        if register:
+            self.registerIDs(IDs)
+
+        # Elements pending to be decoded in lazy mode
+        for dt in self['Digital Threads']:
+            for items in dt.values():
+                if not isinstance(items, MAMLLazyList):
+                    continue
+                for item in items.pending():
+                    id = item.xmld.get('@ID')
+                    if id in self.IDIndex:
+                        self._duplicatedIDs_.add(id)
+                    self.IDIndex[id] = item
+
+    def _indexElement_(self, element: dict) -> None:
+        ''' Add a new element to the ID index '''
+        self.IDIndex[element['ID']] = element
+
+    def _reindexID_(self, element: dict, oldID: str, newID: str) -> None:
+        ''' Patch the ID index when an indexed element changes its ID '''
+        if oldID in self.IDIndex and self.IDIndex[oldID] is element:
+            del self.IDIndex[oldID]
+            self.IDIndex[newID] = element
+
+    @property
+    def operations(self) -> MAMLOperationIndex:
+        '''
+        Query the Operations of every Digital Thread through hash indexes
+
+        e.g. doc.operations.where(Stage='Build', Success=True)
+        '''
+        if self._operations_ is None:
+            self._operations_ = MAMLOperationIndex(self)
+        return self._operations_
+
+    @property
+    def timeline(self) -> MAMLTimeline:
+        '''
+        Query the Operations of every Digital Thread by their timestamp
+
+        e.g. doc.timeline.between('2023-01-01', '2023-02-01')
+        '''
+        if self._timeline_ is None:
+            self._timeline_ = MAMLTimeline(self)
+        return self._timeline_
+
+    def _indexOperation_(self, op: dict) -> None:
+        ''' Add a new Operation to the query indexes already built '''
+        for index in [self._operations_, self._timeline_]:
+            if index is not None:
+                index.add(op)
+
+    def _reindexOperation_(self, op: dict, field: str, old, new) -> None:
+        ''' Patch the query indexes when an indexed field changes '''
+        for index in [self._operations_, self._timeline_]:
+            if index is not None:
+                index.update(op, field, old, new)
+
+    def _staleOperations_(self) -> None:
+        ''' Rebuild the query indexes on the next query '''
+        for index in [self._operations_, self._timeline_]:
+            if index is not None:
+                index.stale = True
+
+    def _findByID_(self, ID: str) -> dict:
+        '''
+        Search for an element by its ID using the index
+
+        The index is only rebuilt when outdated: elements were added to the
+        tracked lists without newFile() and the like, the document was
+        loaded from a dict, or the element found changed its ID. Otherwise
+        a missing ID raises a KeyError right away
+        '''
+        element = self.IDIndex.get(ID)
+        if isinstance(element, _pending_):
+            element = self.IDIndex[ID] = element.resolve()
+        if element is None and self._staleIDs_ or \
+           element is not None and element.get('ID') != ID:
+            self._indexIDs_()
+            element = self.IDIndex.get(ID)
+        if element is None:
+            raise KeyError(ID)
+        if ID in self._duplicatedIDs_:
+            raise Exception(f"findByID found duplicated keys for: {ID}")
+        if isinstance(element, _pending_):
+            element = self.IDIndex[ID] = element.resolve()
+        return element
 
     def _exportTemplate_(self, filePath) -> None:
         ''' Save the current AML without any Digital Thread '''
@@ -1,7 +1,10 @@
 from .base import MAMLBaseElement, findUniqueKeys
+from .links import MAMLLinkIndex
+from .lazy import MAMLLazyList, iterItems
 from .file import MAMLFile
 from .sw import MAMLSoftware
 from .operation import MAMLOperation
+from .tracked import MAMLTrackedList
 
 
 class MAMLDigitalThread(MAMLBaseElement):
@@ -21,25 +24,105 @@ class MAMLDigitalThread(MAMLBaseElement):
 
     _TEMPLATE_XMLD_ = 'dt.json'
 
+    # Index of the InternalLinks, built once per decode
+    linkIndex = None
+
+    # External Interfaces names of the source side of the links
+    _SOURCE_INTERFACES_ = [
+        'InputFile',
+        'OutputFile',
+        'SoftwareUsed',
+        'ConfigFile',
+    ]
+
+    # External Interface name of the target side of every source one
+    _TARGET_INTERFACES_ = {
+        'InputFile': 'InputOf',
+        'OutputFile': 'OutputOf',
+        'SoftwareUsed': 'Operation',
+        'ConfigFile': 'ConfigOf',
+    }
+
+    # Interface class of every External Interface name
+    _INTERFACE_CLASSES_ = {
+        # From Operation
+        'InputFile': 'DigitalThreadInterfaces/FileExchangeConnector',
+        'OutputFile': 'DigitalThreadInterfaces/FileExchangeConnector',
+        'SoftwareUsed':
+            'DigitalThreadInterfaces/SoftwareInterfaceConnector',
+        # From File
+        'InputOf': 'DigitalThreadInterfaces/FileExchangeConnector',
+        'OutputOf': 'DigitalThreadInterfaces/FileExchangeConnector',
+        # From Software
+        'ConfigFile': 'DigitalThreadInterfaces/FileExchangeConnector',
+        'Operation': 'DigitalThreadInterfaces/SoftwareInterfaceConnector',
+    }
+
+    # Lists of the elements of the Digital Thread
+    _ELEMENTS_ = ['Operations', 'Files', 'Softwares']
+
+    # Number of InternalLinks, counted while encoding
+    _links_ = 0
+
+    def __setitem__(self, key, value) -> None:
+        ''' Overload to track the elements added and removed '''
+        if key in self._ELEMENTS_:
+            if type(value) is list:
+                value = MAMLTrackedList(self, value)
+            self.doc._staleIDs_ = True
+            if key == 'Operations':
+                self.doc._staleOperations_()
+        super().__setitem__(key, value)
+
+    def clear(self, newID: bool = True) -> None:
+        ''' Overload to track the elements added and removed '''
+        super().clear(newID)
+        for key in self._ELEMENTS_:
+            dict.__setitem__(self, key, MAMLTrackedList(self, self[key]))
+
+    def _adding_(self, items: list) -> None:
+        ''' Elements not added by newFile() and the like are not indexed '''
+        if any(items is self.get(key) for key in self._ELEMENTS_):
+            self.doc._staleIDs_ = True
+
+    def _removing_(self, items: list) -> None:
+        ''' Removed Operations are dropped from the query indexes '''
+        if items is self.get('Operations'):
+            self.doc._staleOperations_()
+
     def newFile(self) -> MAMLFile:
         f = MAMLFile(Document=self.doc, DigitalThread=self)
         self['Files'].append(f)
+        self.doc._indexElement_(f)
         return f
 
     def newOperation(self) -> MAMLOperation:
         op = MAMLOperation(Document=self.doc, DigitalThread=self)
         self['Operations'].append(op)
+        self.doc._indexElement_(op)
+        self.doc._indexOperation_(op)
         return op
 
     def newSoftware(self) -> MAMLSoftware:
         sw = MAMLSoftware(Document=self.doc, DigitalThread=self)
         self['Softwares'].append(sw)
+        self.doc._indexElement_(sw)
         return sw
 
+    def materialize(self) -> None:
+        ''' Decode every element pending in lazy mode '''
+        for key in ['Files', 'Softwares', 'Operations']:
+            if isinstance(self[key], MAMLLazyList):
+                self[key].materialize()
+
     def _decode_(self, xmld) -> None:
         ''' Load the simplified representation from an XML dictionary '''
         super()._decode_(xmld)
 
+        # Index the InternalLinks before solving any External Interface
+        self.linkIndex = MAMLLinkIndex(
+            self.xmld.get('InternalLink', []), self._lineageEI_())
+
         # Load Modules
         if 'Attribute' in self.xmld:
             for attr in self.xmld['Attribute']:
@@ -54,6 +137,14 @@ class MAMLDigitalThread(MAMLBaseElement):
                     continue
 
         # Load Internal Elements: Operations, Files and Softwares
+        if self.doc.lazy:
+            # Decoded on first access
+            self['Files'] = MAMLLazyList(MAMLFile, self, self._xmldFiles_)
+            self['Softwares'] = MAMLLazyList(
+                MAMLSoftware, self, self._xmldSoftwares_)
+            self['Operations'] = MAMLLazyList(
+                MAMLOperation, self, self._xmldOperations_)
+            return
         for file in self._xmldFiles_:
             self['Files'].append(MAMLFile(
                 Document=self.doc, DigitalThread=self, inputXMLD=file))
@@ -104,54 +195,151 @@ class MAMLDigitalThread(MAMLBaseElement):
                 mods = attr['Attribute']
                 break
 
-        # Load modules
+        # Load modules, skipping the ones already present
+        present = {mod['Value'][0] for mod in mods}
         for module in self['Modules']:
-            # Check if module is already present
-            for mod in mods:
-                if module == mod['Value'][0]:
-                    break
-            else:
-                mod = {}
-                mod.update(mods[0])
-                mod['Value'] = [module]
-                mod['@Name'] = f'Module{len(mods)+1}'
-                mods.append(mod)
+            if module in present:
+                continue
+            present.add(module)
+            mod = {}
+            mod.update(mods[0])
+            mod['Value'] = [module]
+            mod['@Name'] = f'Module{len(mods)+1}'
+            mods.append(mod)
 
         # Load Internal Elements: Operations, Files and Softwares
-        for f in self['Files']:
-            files.append(MAMLFile(
-                Document=self.doc,
-                DigitalThread=self,
-                inputSimpleDict=f)._encode_())
-        for sw in self['Softwares']:
-            sws.append(MAMLSoftware(
-                Document=self.doc,
-                DigitalThread=self,
-                inputSimpleDict=sw)._encode_())
-        for op in self['Operations']:
-            ops.append(MAMLOperation(
-                Document=self.doc,
-                DigitalThread=self,
-                inputSimpleDict=op)._encode_())
-
-        # Create links
-        lineage = findUniqueKeys(self.xmld, '@ID')
-        for op in self['Operations']:
-            sourceID = op['ID']
-            source = lineage[sourceID]
+        # Elements not decoded yet or not modified since decoded are passed
+        # through from their original XML dict
+        # The lineage of the elements by ID is built while appending them,
+        # instead of searching the whole Digital Thread afterwards
+        kept = {}
+        lineage = {}
+        for items, xmlds, cls in (
+            (self['Files'], files, MAMLFile),
+            (self['Softwares'], sws, MAMLSoftware),
+            (self['Operations'], ops, MAMLOperation),
+        ):
+            for element, xmld in iterItems(items):
+                if xmld is not None:
+                    index = items.owner.linkIndex
+                elif isinstance(element, MAMLBaseElement) and \
+                        not element.dirty:
+                    xmld = element.xmld
+                    index = element.dt.linkIndex
+                else:
+                    xmld = cls(
+                        Document=self.doc,
+                        DigitalThread=self,
+                        inputSimpleDict=element)._encode_()
+                    self._addLineage_(lineage, xmld)
+                    xmlds.append(xmld)
+                    continue
+                xmld = dict(xmld)
+                kept[xmld['@ID']] = (xmld, index)
+                self._addLineage_(lineage, xmld)
+                xmlds.append(xmld)
+
+        def find(ID) -> dict:
+            try:
+                return lineage[ID]
+            except KeyError:
+                # Not an element, search the whole Digital Thread
+                lineage.update(findUniqueKeys(self.xmld, '@ID'))
+                return lineage[ID]
+
+        # Collect the links as (source, target, interface, sourceEI)
+        links = []
+        if kept:
+            for source, sourceEI, targetID in self._keepLinks_(
+                    kept, lineage):
+                links.append(
+                    (source, find(targetID), sourceEI['@Name'], sourceEI))
+        for op, _ in iterItems(self['Operations']):
+            if op is None or op['ID'] in kept:
+                continue
+            source = find(op['ID'])
             for interface in ['InputFile', 'OutputFile', 'SoftwareUsed']:
                 for targetID in op[interface]:
-                    target = lineage[targetID]
-                    self._newLink_(source, target, interface)
-        for sw in self['Softwares']:
-            sourceID = sw['ID']
-            source = lineage[sourceID]
+                    links.append((source, find(targetID), interface, None))
+        for sw, _ in iterItems(self['Softwares']):
+            if sw is None or sw['ID'] in kept:
+                continue
+            source = find(sw['ID'])
             for targetID in sw['ConfigFile']:
-                target = lineage[targetID]
-                self._newLink_(source, target, 'ConfigFile')
+                links.append((source, find(targetID), 'ConfigFile', None))
+
+        # Create links, with the IDs of their new interfaces allocated at once
+        IDs = iter(self.doc.generateIDs(
+            sum(2 if sourceEI is None else 1 for *_, sourceEI in links)))
+        self._links_ = self._lastLink_()
+        for source, target, interface, sourceEI in links:
+            self._newLink_(source, target, interface, sourceEI, IDs=IDs)
 
         return self.xmld
 
+    @staticmethod
+    def _addLineage_(lineage: dict, xmld: dict) -> None:
+        ''' Add an element XML dict to the lineage, its ID must be unique '''
+        ID = xmld['@ID']
+        if ID in lineage:
+            raise Exception(f'Duplicated ID in Digital Thread: {ID}')
+        lineage[ID] = xmld
+
+    def _keepLinks_(self, kept: dict, lineage: dict) -> list:
+        '''
+        Keep the InternalLinks between elements passed through
+
+        kept is a dict of the passed through elements IDs, their XML dict
+        and the link index of the Digital Thread they were decoded from
+
+        Interfaces linked with elements encoded again are removed, except
+        the ones of the source (Operation or Software) which are returned
+        as (source, sourceEI, targetID) to be linked again in place. A
+        source linked with an element no longer in the Digital Thread
+        raises a KeyError, like the elements encoded again
+
+        Every kept XML dict gets an ExternalInterface list, even an empty
+        one, as new links may be added to it
+        '''
+        relinks = []
+        links = {}
+        for xmld, index in kept.values():
+            eis = []
+            for ei in xmld.get('ExternalInterface', []):
+                partner = index.partner(ei.get('@ID'))
+                if partner is None:
+                    # Not linked, keep as it is
+                    eis.append(ei)
+                    continue
+                targetID = index.owner(partner)
+                if targetID in kept:
+                    eis.append(ei)
+                    link = index.links[ei['@ID']]
+                    links[id(link)] = link
+                elif ei.get('@Name') in self._SOURCE_INTERFACES_:
+                    if targetID not in lineage:
+                        raise KeyError(targetID)
+                    eis.append(ei)
+                    relinks.append((xmld, ei, targetID))
+            xmld['ExternalInterface'] = eis
+
+        self.xmld['InternalLink'].extend(links.values())
+
+        return relinks
+
+    def _lastLink_(self) -> int:
+        '''
+        Returns the highest number of the InternalLinks names
+
+        Kept links keep their names, so new links are numbered after them
+        '''
+        last = 0
+        for link in self.xmld['InternalLink']:
+            name = link.get('@Name') or ''
+            if name.startswith('InternalLink') and name[12:].isdigit():
+                last = max(last, int(name[12:]))
+        return last
+
     def _lineageEI_(self) -> dict:
         ''' Returns a dict of External Interface ID and its parent ID '''
         eis = {}
@@ -175,82 +363,54 @@ class MAMLDigitalThread(MAMLBaseElement):
 
     def _solveEI_(self, sourceEIID) -> str:
         ''' Find the opposite element ID linked with an External Interface '''
-
-        if 'InternalLink' not in self.xmld:
+        if self.linkIndex is None:
             return None
-
-        lineage = self._lineageEI_()
-
-        for link in self.xmld['InternalLink']:
-            A = link['@RefPartnerSideA']
-            B = link['@RefPartnerSideB']
-            if sourceEIID == A:
-                targetEIID = B
-            elif sourceEIID == B:
-                targetEIID = A
-            else:
-                continue
-
-            if targetEIID in lineage:
-                return lineage[targetEIID]
-
-        return None
+        return self.linkIndex.solve(sourceEIID)
 
     def _newLink_(
         self,
         source: dict,
         target: dict,
         interface: str,
+        sourceEI: dict = None,
+        IDs=None,
     ) -> None:
-        ''' Link source and target by adding External Interfaces '''
-
-        def getTargetName(sourceName: str) -> str:
-            return {
-                'InputFile': 'InputOf',
-                'OutputFile': 'OutputOf',
-                'SoftwareUsed': 'Operation',
-                'ConfigFile': 'ConfigOf',
-            }[sourceName]
-
-        def getRefBaseClassPath(name):
-            if name in [
-                # From Operation
-                'InputFile', 'OutputFile',
-                # From File
-                'InputOf', 'OutputOf',
-                # From Software
-                'ConfigFile',
-            ]:
-                return 'DigitalThreadInterfaces/FileExchangeConnector'
-            elif name in [
-                # From Operation
-                'SoftwareUsed',
-                # From Software
-                'Operation'
-            ]:
-                return 'DigitalThreadInterfaces/SoftwareInterfaceConnector'
-            else:
-                raise NotImplementedError(
-                    f'Unknown External Interface name: {name}')
+        '''
+        Link source and target by adding External Interfaces
+
+        An existing source External Interface can be reused
+
+        :param IDs: iterator of new IDs for the interfaces, allocated by
+            the caller for several links at once
+        '''
+        if IDs is None:
+            IDs = iter(self.doc.generateIDs(1 if sourceEI else 2))
+
+        try:
+            refBaseClassPath = self._INTERFACE_CLASSES_[interface]
+        except KeyError:
+            raise NotImplementedError(
+                f'Unknown External Interface name: {interface}')
 
         # Create new interfaces at both ends
-        sourceEI = {
-            "@RefBaseClassPath": getRefBaseClassPath(interface),
-            "@ID": self.doc.generateID(),
-            "@Name": interface,
-        }
-        source['ExternalInterface'].append(sourceEI)
+        if sourceEI is None:
+            sourceEI = {
+                "@RefBaseClassPath": refBaseClassPath,
+                "@ID": next(IDs),
+                "@Name": interface,
+            }
+            source['ExternalInterface'].append(sourceEI)
         targetEI = {
-            "@RefBaseClassPath": getRefBaseClassPath(interface),
-            "@ID": self.doc.generateID(),
-            "@Name": getTargetName(interface),
+            "@RefBaseClassPath": refBaseClassPath,
+            "@ID": next(IDs),
+            "@Name": self._TARGET_INTERFACES_[interface],
         }
         target['ExternalInterface'].append(targetEI)
 
-        # Create link
-        n = len(self.xmld['InternalLink'])
+        # Create link, numbered by the counter set in _encode_
+        self._links_ += 1
         self.xmld['InternalLink'].append({
             '@RefPartnerSideA': sourceEI['@ID'],
             '@RefPartnerSideB': targetEI['@ID'],
-            '@Name': f'InternalLink{n + 1}'
+            '@Name': f'InternalLink{self._links_}'
         })
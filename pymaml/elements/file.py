@@ -1,6 +1,5 @@
-from copy import deepcopy
-
 from .base import MAMLBaseElement
+from .templates import XMLDTemplates, compileTemplate
 
 
 class MAMLFile(MAMLBaseElement):
@@ -31,6 +30,20 @@ class MAMLFile(MAMLBaseElement):
 
     _TEMPLATE_XMLD_ = 'file.json'
 
+    # Constructor of a new subfile simplified dict
+    _subFileTemplate_ = staticmethod(compileTemplate(_TEMPLATE_['Files'][0]))
+
+    # Constructor of a new subfile XML dict, compiled on first use
+    _newSubFileXMLD_ = None
+
+    @classmethod
+    def _subFileXMLD_(cls) -> dict:
+        ''' Returns a new subfile XML dict, the first one of the template '''
+        if cls._newSubFileXMLD_ is None:
+            cls._newSubFileXMLD_ = staticmethod(compileTemplate(
+                XMLDTemplates.load(cls._TEMPLATE_XMLD_)['InternalElement'][0]))
+        return cls._newSubFileXMLD_()
+
     def _decode_(self, xmld) -> None:
         ''' Load the simplified representation from an XML dictionary '''
         super()._decode_(xmld)
@@ -39,7 +52,7 @@ class MAMLFile(MAMLBaseElement):
         self['Files'] = []
         for subfile in self.xmld['InternalElement']:
             try:
-                file = deepcopy(MAMLFile._TEMPLATE_['Files'][0])
+                file = self._subFileTemplate_()
                 for attr in subfile['ExternalInterface'][0]['Attribute']:
                     for subattr in attr['Attribute']:
                         try:
@@ -58,12 +71,13 @@ class MAMLFile(MAMLBaseElement):
         ''' Export the simplified representation to an XML dictionary '''
         super()._encode_()
 
-        # Load subfiles
-        template = deepcopy(self.xmld['InternalElement'][0])
+        # Load subfiles, all of them with the ID of the template one
+        ID = self.xmld['InternalElement'][0]['@ID']
         self.xmld['InternalElement'] = []
         for subfile in self['Files']:
             try:
-                file = deepcopy(template)
+                file = self._subFileXMLD_()
+                file['@ID'] = ID
                 for attr in file['ExternalInterface'][0]['Attribute']:
                     for subattr in attr['Attribute']:
                         try:
@@ -77,15 +91,19 @@ class MAMLFile(MAMLBaseElement):
                 print(f'''Failed to export MAMLFile subfile ({self['ID']})''')
 
         # Generate nested External Interfaces IDs
-        for ie in self.xmld['InternalElement']:
-            for ei in ie['ExternalInterface']:
-                ei['@ID'] = self.doc.generateID()
+        eis = [
+            ei
+            for ie in self.xmld['InternalElement']
+            for ei in ie['ExternalInterface']
+        ]
+        for ei, ID in zip(eis, self.doc.generateIDs(len(eis))):
+            ei['@ID'] = ID
 
         return self.xmld
 
     def newSubFile(self) -> dict:
         ''' Add a new empty SubFile and append it to the current File '''
-        template = deepcopy(self._TEMPLATE_['Files'][0])
+        template = self._subFileTemplate_()
         # Check if last SubFile is empty
         if self['Files'][-1] != template:
             self['Files'].append(template)
@@ -0,0 +1,127 @@
+from .tracked import MAMLTrackedList
+
+
+class _pending_():
+    ''' XML dict of an element not decoded yet '''
+
+    __slots__ = ('xmld', 'cls', 'dt', 'element')
+
+    def __init__(self, xmld: dict, cls, dt) -> None:
+        self.xmld = xmld
+        self.cls = cls
+        self.dt = dt
+        self.element = None
+
+    def resolve(self):
+        ''' Decode the element, only once '''
+        if self.element is None:
+            self.element = self.cls(
+                Document=self.dt.doc,
+                DigitalThread=self.dt,
+                inputXMLD=self.xmld,
+            )
+        return self.element
+
+
+class MAMLLazyList(MAMLTrackedList):
+    '''
+    List of Digital Thread elements decoded on first access
+
+    Items are kept as their XML dict until they are read, then decoded and
+    cached in place. Operations that need every item (comparisons, sorting,
+    searching...) decode the whole list first.
+    '''
+
+    def __init__(self, cls, dt, xmlds: list) -> None:
+        ''' Create the list of elements of class cls from their XML dicts '''
+        super().__init__(dt, [_pending_(xmld, cls, dt) for xmld in xmlds])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        item = super().__getitem__(i)
+        if type(item) is _pending_:
+            item = item.resolve()
+            # Caching the decoded element is not a modification
+            list.__setitem__(self, i, item)
+        return item
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in reversed(range(len(self))):
+            yield self[i]
+
+    def materialize(self) -> list:
+        ''' Decode every pending element '''
+        for i in range(len(self)):
+            self[i]
+        return self
+
+    def pending(self):
+        ''' Iterate over the elements not decoded yet '''
+        for item in super().__iter__():
+            if type(item) is _pending_ and item.element is None:
+                yield item
+
+    def __contains__(self, value) -> bool:
+        self.materialize()
+        return super().__contains__(value)
+
+    def __eq__(self, other) -> bool:
+        self.materialize()
+        return super().__eq__(other)
+
+    def __ne__(self, other) -> bool:
+        self.materialize()
+        return super().__ne__(other)
+
+    def __add__(self, other) -> list:
+        self.materialize()
+        return super().__add__(other)
+
+    def __repr__(self) -> str:
+        self.materialize()
+        return super().__repr__()
+
+    def copy(self) -> list:
+        return list(self)
+
+    def count(self, value) -> int:
+        self.materialize()
+        return super().count(value)
+
+    def index(self, *args) -> int:
+        self.materialize()
+        return super().index(*args)
+
+    def pop(self, i=-1):
+        item = self[i]
+        super().pop(i)
+        return item
+
+    def remove(self, value) -> None:
+        self.materialize()
+        super().remove(value)
+
+    def sort(self, *args, **kargs) -> None:
+        self.materialize()
+        super().sort(*args, **kargs)
+
+
+def iterItems(items: list):
+    '''
+    Iterate over a list of elements without decoding the pending ones
+
+    Yields (element, None) for decoded elements and (None, XML dict) for
+    pending elements
+    '''
+    for item in list.__iter__(items):
+        if type(item) is _pending_:
+            if item.element is None:
+                yield None, item.xmld
+                continue
+            item = item.element
+        yield item, None
@@ -0,0 +1,59 @@
+class MAMLLinkIndex():
+    '''
+    Bidirectional index of the InternalLinks of a Digital Thread
+
+    Maps every External Interface ID to its partner External Interface ID
+    and to the ID of the element owning it, so solving an interface is a
+    constant time lookup
+    '''
+
+    def __init__(self, links: list = None, lineage: dict = None) -> None:
+        '''
+        Build the index from the InternalLinks of a Digital Thread
+
+        :param links: XML dict InternalLink list
+        :param lineage: dict of External Interface ID and its parent ID
+        '''
+        # External Interface ID --> owning element ID
+        self.owners = dict(lineage or {})
+
+        # External Interface ID --> partner External Interface ID
+        self.partners = {}
+
+        # Element ID --> list of its linked External Interface IDs
+        self.interfaces = {}
+
+        # External Interface ID --> InternalLink XML dict
+        self.links = {}
+
+        for link in links or []:
+            try:
+                A = link['@RefPartnerSideA']
+                B = link['@RefPartnerSideB']
+            except KeyError:
+                continue
+            for source, target in ((A, B), (B, A)):
+                # Keep the first link reaching a known element
+                if source in self.partners or target not in self.owners:
+                    continue
+                self.partners[source] = target
+                self.links[source] = link
+                if source in self.owners:
+                    self.interfaces.setdefault(
+                        self.owners[source], []).append(source)
+
+    def partner(self, eiID: str) -> str:
+        ''' Returns the External Interface ID linked with eiID '''
+        return self.partners.get(eiID)
+
+    def owner(self, eiID: str) -> str:
+        ''' Returns the ID of the element owning the External Interface '''
+        return self.owners.get(eiID)
+
+    def solve(self, eiID: str) -> str:
+        ''' Find the opposite element ID linked with an External Interface '''
+        return self.owners.get(self.partners.get(eiID))
+
+    def linked(self, ID: str) -> list:
+        ''' Returns the IDs of all the elements linked with an element '''
+        return [self.solve(ei) for ei in self.interfaces.get(ID, [])]
@@ -1,6 +1,33 @@
 from .base import MAMLBaseElement
 from .file import MAMLFile
 from .sw import MAMLSoftware
+from .tracked import MAMLTrackedDict
+
+
+class MAMLUserInfo(MAMLTrackedDict):
+    ''' User Info of an Operation, keeping the query indexes up to date '''
+
+    # Fields of the query indexes, see MAMLDocument.operations and timeline
+    _INDEXED_ = ['Username', 'Timestamp']
+
+    def __setitem__(self, key, value) -> None:
+        if key in self._INDEXED_:
+            self.owner._reindex_(key, self.get(key), value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        if key in self._INDEXED_:
+            self.owner._reindex_(key, self.get(key), None)
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key in self._INDEXED_:
+            self.owner._reindex_(key, self.get(key), None)
+        return super().pop(key, *default)
+
+    def update(self, *args, **kargs) -> None:
+        for key, value in dict(*args, **kargs).items():
+            self[key] = value
 
 
 class MAMLOperation(MAMLBaseElement):
@@ -47,6 +74,58 @@ class MAMLOperation(MAMLBaseElement):
     _OPS_LIB_KEY_ = '@RefBaseSystemUnitPath'
     _OPS_LIB_PREFIX_ = 'Operations/'
 
+    # Fields of the query index, see MAMLDocument.operations
+    _INDEXED_ = ['Module', 'Type', 'Stage', 'Step', 'Success']
+
+    def __setitem__(self, key, value) -> None:
+        ''' Overload to keep the query indexes up to date '''
+        if key in self._INDEXED_:
+            self._reindex_(key, self.get(key), value)
+        elif key == 'UserInfo':
+            value = MAMLUserInfo(self, value or {})
+            old = self.get('UserInfo') or {}
+            for field in MAMLUserInfo._INDEXED_:
+                self._reindex_(field, old.get(field), value.get(field))
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self._unindex_(key)
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._unindex_(key)
+        return super().pop(key, *default)
+
+    def update(self, *args, **kargs) -> None:
+        for key, value in dict(*args, **kargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        ''' Overload to merge through the reindexing update() '''
+        self.update(other)
+        return self
+
+    def clear(self, newID: bool = True) -> None:
+        ''' Overload to track the changes of the User Info '''
+        super().clear(newID)
+        dict.__setitem__(
+            self, 'UserInfo', MAMLUserInfo(self, self['UserInfo']))
+
+    def _reindex_(self, field: str, old, new) -> None:
+        ''' Move the Operation in the query indexes of the document '''
+        if old != new:
+            self.doc._reindexOperation_(self, field, old, new)
+
+    def _unindex_(self, key) -> None:
+        ''' Reindex the fields of a removed item as None '''
+        if key in self._INDEXED_:
+            self._reindex_(key, self.get(key), None)
+        elif key == 'UserInfo':
+            old = self.get('UserInfo') or {}
+            for field in MAMLUserInfo._INDEXED_:
+                self._reindex_(field, old.get(field), None)
+
     def newInputFile(self) -> MAMLFile:
         return self._newIOFile_('InputFile')
 
@@ -57,12 +136,14 @@ class MAMLOperation(MAMLBaseElement):
         f = MAMLFile(Document=self.doc, DigitalThread=self.dt)
         self[direction].append(f['ID'])
         self.dt['Files'].append(f)
+        self.doc._indexElement_(f)
         return f
 
     def newSoftwareUsed(self) -> MAMLSoftware:
         sw = MAMLSoftware(Document=self.doc, DigitalThread=self.dt)
         self['SoftwareUsed'].append(sw['ID'])
         self.dt['Softwares'].append(sw)
+        self.doc._indexElement_(sw)
         return sw
 
     def getOperationType(self) -> str:
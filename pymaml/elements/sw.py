@@ -31,4 +31,5 @@ class MAMLSoftware(MAMLBaseElement):
         f = MAMLFile(Document=self.doc, DigitalThread=self.dt)
         self['ConfigFile'].append(f['ID'])
         self.dt['Files'].append(f)
+        self.doc._indexElement_(f)
         return f
@@ -0,0 +1,104 @@
+import json
+from os.path import dirname, join
+
+
+class MAMLTemplateCache():
+    '''
+    Cache of the XML dict templates stored as JSON files
+
+    Every template is read from disk only once and compiled into a
+    constructor, handing out fresh copies: nested dicts and lists are
+    rebuilt, while the immutable leaves (strings, numbers, None) are shared
+    with the cached template
+    '''
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+        self.templates = {}
+        self.constructors = {}
+
+        # Diagnostics: number of disk reads and copies per template
+        self.loads = {}
+        self.copies = {}
+
+    def load(self, name: str) -> dict:
+        ''' Returns the cached template, reading it on first use '''
+        try:
+            return self.templates[name]
+        except KeyError:
+            pass
+
+        self.loads[name] = self.loads.get(name, 0) + 1
+        try:
+            template = json.load(open(join(self.folder, name), mode='r'))
+        except (TypeError, OSError, ValueError):
+            template = {}
+        self.templates[name] = template
+        return template
+
+    def get(self, name: str) -> dict:
+        ''' Returns a new copy of the template, safe to modify '''
+        try:
+            constructor = self.constructors[name]
+        except KeyError:
+            constructor = compileTemplate(self.load(name))
+            self.constructors[name] = constructor
+        self.copies[name] = self.copies.get(name, 0) + 1
+        return constructor()
+
+    def stats(self) -> dict:
+        ''' Returns the load and copy counts of every template '''
+        return {
+            name: {
+                'loads': self.loads.get(name, 0),
+                'copies': self.copies.get(name, 0),
+            }
+            for name in self.loads
+        }
+
+
+def fastcopy(var):
+    ''' Copy nested dicts and lists from JSON, much cheaper than deepcopy '''
+    if type(var) is dict:
+        return {k: fastcopy(v) for k, v in var.items()}
+    elif type(var) is list:
+        return [fastcopy(v) for v in var]
+    return var
+
+
+# Leaves written as literals in the compiled constructors
+_LITERALS_ = (str, int, bool, type(None))
+
+
+def compileTemplate(template):
+    '''
+    Returns a function building a new copy of a template on every call
+
+    The template is compiled into a single display expression, so the
+    copies are built by the interpreter as if the template was written in
+    the source code, without walking it. Leaves other than strings,
+    integers, booleans and None are shared between the copies
+    '''
+    constants = {}
+
+    def source(var) -> str:
+        if type(var) is dict:
+            return '{' + ', '.join(
+                f'{source(k)}: {source(v)}' for k, v in var.items()) + '}'
+        elif type(var) is list:
+            return '[' + ', '.join(source(v) for v in var) + ']'
+        elif type(var) in _LITERALS_:
+            return repr(var)
+        name = f'_{len(constants)}'
+        constants[name] = var
+        return name
+
+    try:
+        return eval(f'lambda: {source(template)}', constants)
+    except (SyntaxError, RecursionError, MemoryError):
+        # Too deeply nested to be compiled
+        return lambda: fastcopy(template)
+
+
+# XML dict templates stored next to the element classes
+XMLDTemplates = MAMLTemplateCache(dirname(__file__))
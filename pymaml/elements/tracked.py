@@ -0,0 +1,96 @@
+import copyreg
+from copy import deepcopy
+
+
+class MAMLTrackedList(list):
+    ''' List notifying its owner element when it is modified '''
+
+    def __init__(self, owner, items=()) -> None:
+        super().__init__(items)
+        self.owner = owner
+
+    def __deepcopy__(self, memo) -> list:
+        ''' Copies are plain lists, detached from the owner '''
+        return [deepcopy(item, memo) for item in self]
+
+    def __reduce_ex__(self, protocol):
+        ''' Pickle support: restore the owner before the items '''
+        return (
+            copyreg.__newobj__,
+            (type(self),),
+            (self.__dict__, list(list.__iter__(self))),
+        )
+
+    def __setstate__(self, state) -> None:
+        attrs, items = state
+        self.__dict__.update(attrs)
+        list.extend(self, items)
+
+
+class MAMLTrackedDict(dict):
+    ''' Dict notifying its owner element when it is modified '''
+
+    def __init__(self, owner, items=()) -> None:
+        super().__init__(items)
+        self.owner = owner
+
+    def __deepcopy__(self, memo) -> dict:
+        ''' Copies are plain dicts, detached from the owner '''
+        return {k: deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce_ex__(self, protocol):
+        ''' Pickle support: restore the owner before the items '''
+        return (copyreg.__newobj__, (type(self),), (self.__dict__, dict(self)))
+
+    def __setstate__(self, state) -> None:
+        attrs, items = state
+        self.__dict__.update(attrs)
+        dict.update(self, items)
+
+
+def _touching_(method, hooks=()):
+    '''
+    Wrap a mutating method to mark the owner element as modified, and call
+    the hooks of the owner notified of the items added or removed
+    '''
+    def wrapper(self, *args, **kargs):
+        self.owner._touch_()
+        for hook in hooks:
+            getattr(self.owner, hook)(self)
+        return method(self, *args, **kargs)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for name, hooks in [
+    ('append', ['_adding_']),
+    ('extend', ['_adding_']),
+    ('insert', ['_adding_']),
+    ('__iadd__', ['_adding_']),
+    ('__setitem__', ['_removing_', '_adding_']),
+    ('pop', ['_removing_']),
+    ('remove', ['_removing_']),
+    ('clear', ['_removing_']),
+    ('__delitem__', ['_removing_']),
+    ('__imul__', ['_removing_']),
+    ('sort', []),
+    ('reverse', []),
+]:
+    setattr(MAMLTrackedList, name, _touching_(getattr(list, name), hooks))
+
+for name in [
+    'update', 'pop', 'popitem', 'clear', 'setdefault',
+    '__setitem__', '__delitem__', '__ior__',
+]:
+    setattr(MAMLTrackedDict, name, _touching_(getattr(dict, name)))
+
+
+def track(owner, value):
+    ''' Convert nested lists and dicts to their tracked versions '''
+    if type(value) is list:
+        return MAMLTrackedList(owner, [track(owner, v) for v in value])
+    elif type(value) is dict:
+        return MAMLTrackedDict(
+            owner, {k: track(owner, v) for k, v in value.items()})
+    return value
@@ -0,0 +1,97 @@
+from uuid import UUID
+
+
+class MAMLIDRegistry(set):
+    '''
+    Set of IDs already used in a Master AML document
+
+    Membership checks and registrations are O(1), so loading or building
+    a document with N IDs is linear instead of quadratic
+    '''
+
+    # Number of IDs registered, including repeated ones, to check that
+    # every ID node is only visited once while loading a document
+    registrations = 0
+
+    def register(self, ID) -> None:
+        ''' Save an ID to avoid duplicates '''
+        self.registrations += 1
+        self.add(str(ID))
+
+    def registerMany(self, IDs) -> None:
+        ''' Save all the IDs from an iterable in a single bulk update '''
+        IDs = list(map(str, IDs))
+        self.registrations += len(IDs)
+        self.update(IDs)
+
+    def isFree(self, ID) -> bool:
+        ''' Returns True if the ID has not been registered yet '''
+        return str(ID) not in self
+
+    def snapshot(self) -> frozenset:
+        ''' Returns an immutable copy of the registered IDs '''
+        return frozenset(self)
+
+    def restore(self, snapshot) -> None:
+        ''' Replace the registered IDs by a previous snapshot '''
+        self.clear()
+        self.update(snapshot)
+
+
+class MAMLIDLayer(MAMLIDRegistry):
+    '''
+    Registry of the IDs added on top of a read-only set of IDs
+
+    Used by worker processes: the IDs of the whole document are shared as
+    the base, and only the IDs registered by the worker are kept, to be
+    merged back into the document registry
+    '''
+
+    def __init__(self, base=frozenset()) -> None:
+        super().__init__()
+        self.base = base
+
+    def __contains__(self, ID) -> bool:
+        return set.__contains__(self, ID) or ID in self.base
+
+    def register(self, ID) -> None:
+        ''' Save an ID to avoid duplicates, unless already in the base '''
+        self.registrations += 1
+        ID = str(ID)
+        if ID not in self.base:
+            self.add(ID)
+
+    def registerMany(self, IDs) -> None:
+        ''' Save all the IDs from an iterable not already in the base '''
+        IDs = list(map(str, IDs))
+        self.registrations += len(IDs)
+        base = self.base
+        self.update(ID for ID in IDs if ID not in base)
+
+
+class MAMLIDCounter():
+    '''
+    Deterministic generator of UUIDs, used for replicable IDs
+
+    Every UUID holds the seed in its high 64 bits and a counter in the low
+    ones, so the same seed always generates the same sequence, without
+    repeating any ID until 2**62 of them are generated
+    '''
+
+    def __init__(self, seed: int = 0) -> None:
+        self.setstate((seed, 0))
+
+    def next(self) -> str:
+        ''' Returns the next UUID of the sequence '''
+        self.count += 1
+        # Counter with the variant bits of the UUID set to 10
+        low = f'{self.count | 1 << 63:016x}'
+        return f'{self.prefix}{low[:4]}-{low[4:]}'
+
+    def getstate(self) -> tuple:
+        return self.seed, self.count
+
+    def setstate(self, state: tuple) -> None:
+        self.seed, self.count = state
+        # High 64 bits: seed with the version bits set to 4
+        self.prefix = str(UUID(int=self.seed << 64, version=4))[:19]
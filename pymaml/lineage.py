@@ -0,0 +1,201 @@
+from array import array
+
+
+class MAMLLineage():
+    '''
+    Provenance graph of the Files, Softwares and Operations of a document
+
+    Built once from the ID lists of the elements: data flows from the
+    input files and the softwares to the Operations, from the config files
+    to the Softwares, and from the Operations to their output files.
+
+    Elements are numbered and the links are stored in both directions as
+    compressed sparse rows: an array of offsets per element and an array
+    of the linked element numbers. Transitive queries walk these arrays,
+    visiting every element once even with cycles, and the closures are
+    memoized so later queries reuse them
+
+    The graph is not updated when the document is modified, call rebuild()
+    '''
+
+    # Element kinds and the keys of their lists in the Digital Threads
+    KINDS = ('Operation', 'File', 'Software')
+    _LISTS_ = ('Operations', 'Files', 'Softwares')
+
+    def __init__(self, doc) -> None:
+        self.doc = doc
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        ''' Build the graph from the document, decoding pending elements '''
+        # Element number: ID, kind, and the number of every ID
+        self.IDs = []
+        self.kinds = bytearray()
+        self.index = {}
+
+        # Links to unknown IDs, as (source ID, target ID)
+        self.dangling = []
+
+        links = {}
+        for dt in self.doc['Digital Threads']:
+            for code, key in enumerate(self._LISTS_):
+                for element in dt[key]:
+                    if element['ID'] not in self.index:
+                        self.index[element['ID']] = len(self.IDs)
+                        self.IDs.append(element['ID'])
+                        self.kinds.append(code)
+            for op in dt['Operations']:
+                for ID in op.get('InputFile', []):
+                    links[ID, op['ID']] = None
+                for ID in op.get('SoftwareUsed', []):
+                    links[ID, op['ID']] = None
+                for ID in op.get('OutputFile', []):
+                    links[op['ID'], ID] = None
+            for sw in dt['Softwares']:
+                for ID in sw.get('ConfigFile', []):
+                    links[ID, sw['ID']] = None
+
+        sources = array('i')
+        targets = array('i')
+        for sourceID, targetID in links:
+            source = self.index.get(sourceID)
+            target = self.index.get(targetID)
+            if source is None or target is None:
+                self.dangling.append((sourceID, targetID))
+                continue
+            sources.append(source)
+            targets.append(target)
+
+        n = len(self.IDs)
+        self._down_ = _csr_(n, sources, targets)
+        self._up_ = _csr_(n, targets, sources)
+
+        # Memoized closures by direction, upstream first
+        self._closures_ = ({}, {})
+
+    def __len__(self) -> int:
+        return len(self.IDs)
+
+    def __contains__(self, ID) -> bool:
+        return ID in self.index
+
+    def kind(self, ID: str) -> str:
+        ''' Returns the kind of an element: Operation, File or Software '''
+        return self.KINDS[self.kinds[self._node_(ID)]]
+
+    def upstream(self, ID: str, transitive=False, kind: str = None) -> list:
+        '''
+        Returns the IDs of the elements an element was produced from
+
+        e.g. the Operations producing a file, transitively:
+            lineage.upstream(fileID, transitive=True, kind='Operation')
+
+        :param transitive: include the whole history, not only the direct
+            sources
+        :param kind: only return elements of a kind: Operation, File or
+            Software
+        '''
+        return self._query_(self._node_(ID), True, transitive, kind)
+
+    def downstream(self, ID: str, transitive=False, kind: str = None) -> list:
+        '''
+        Returns the IDs of the elements produced from an element
+
+        :param transitive: include every derived element, not only the
+            direct ones
+        :param kind: only return elements of a kind: Operation, File or
+            Software
+        '''
+        return self._query_(self._node_(ID), False, transitive, kind)
+
+    def upstreamMany(self, IDs, transitive=True, kind: str = None) -> dict:
+        ''' Returns the upstream elements of every ID, see upstream() '''
+        return self._queryMany_(IDs, True, transitive, kind)
+
+    def downstreamMany(self, IDs, transitive=True, kind: str = None) -> dict:
+        ''' Returns the downstream elements of every ID, see downstream() '''
+        return self._queryMany_(IDs, False, transitive, kind)
+
+    def _node_(self, ID: str) -> int:
+        ''' Returns the number of an element '''
+        try:
+            return self.index[ID]
+        except KeyError:
+            raise KeyError(f'Unknown element in the lineage: {ID}')
+
+    def _queryMany_(self, IDs, up: bool, transitive, kind) -> dict:
+        '''
+        Query several elements, the upstream ones first when going up and
+        the downstream ones first when going down, so most walks stop at
+        closures already memoized
+        '''
+        nodes = {ID: self._node_(ID) for ID in IDs}
+        for node in sorted(set(nodes.values()), reverse=not up):
+            if transitive:
+                self._closure_(node, up)
+        return {
+            ID: self._query_(node, up, transitive, kind)
+            for ID, node in nodes.items()
+        }
+
+    def _query_(self, node: int, up: bool, transitive, kind) -> list:
+        ''' Returns the IDs linked with an element in a direction '''
+        if transitive:
+            nodes = self._closure_(node, up)
+        else:
+            offsets, adjacency = self._up_ if up else self._down_
+            nodes = adjacency[offsets[node]:offsets[node + 1]]
+        if kind is not None:
+            if kind not in self.KINDS:
+                raise ValueError(f'Unknown element kind: {kind}')
+            code = self.KINDS.index(kind)
+            nodes = [n for n in nodes if self.kinds[n] == code]
+        return [self.IDs[n] for n in nodes]
+
+    def _closure_(self, node: int, up: bool) -> tuple:
+        '''
+        Returns the numbers of the elements reachable from an element
+
+        The element itself is only included if it is part of a cycle.
+        Walking stops at the elements with a memoized closure, which is
+        complete, so it is merged without visiting them again
+        '''
+        closures = self._closures_[0 if up else 1]
+        try:
+            return closures[node]
+        except KeyError:
+            pass
+
+        offsets, adjacency = self._up_ if up else self._down_
+        reached = set()
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for m in adjacency[offsets[n]:offsets[n + 1]]:
+                if m in reached:
+                    continue
+                reached.add(m)
+                closure = closures.get(m)
+                if closure is None:
+                    stack.append(m)
+                else:
+                    reached.update(closure)
+
+        closure = closures[node] = tuple(sorted(reached))
+        return closure
+
+
+def _csr_(n: int, sources: array, targets: array) -> tuple:
+    ''' Returns the offsets and adjacency arrays of n nodes and the links '''
+    offsets = array('i', [0]) * (n + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    adjacency = array('i', [0]) * len(sources)
+    fill = offsets[:-1]
+    for source, target in zip(sources, targets):
+        adjacency[fill[source]] = target
+        fill[source] += 1
+    return offsets, adjacency
@@ -1,9 +1,14 @@
-import json
-import xmltodict
+import gzip
 
-from random import Random
-from uuid import UUID, uuid4
+from uuid import uuid4
 
+from .ids import MAMLIDRegistry, MAMLIDCounter
+from .backends import getBackend, getJSONBackend
+from .snapshot import dumpSnapshot, loadSnapshot
+from .cache import getCache
+from .reader import MAMLReader
+from .writer import MAMLWriter
+from .elements.base import findkey
 from .elements.doc import MAMLDocument, MAMLDigitalThread
 
 
@@ -12,7 +17,18 @@ class MasterAML(MAMLDocument):
     Class to handle Master AML files (high level API)
     '''
 
-    def __init__(self, input=None, replicableIDs=False) -> None:
+    def __init__(
+        self,
+        input=None,
+        replicableIDs=False,
+        streaming=False,
+        lazy=False,
+        workers=None,
+        backend=None,
+        jsonBackend=None,
+        cacheDir=None,
+        cacheSize=None,
+    ) -> None:
         '''
         Initialize a Master AML from a dictionary, a JSON file path
         or an actual AML file path
@@ -20,6 +36,36 @@ class MasterAML(MAMLDocument):
         Set replicableIDs to True to always generate the same set of IDs,
         useful to compare files during development
 
+        Set streaming to True to parse AML files incrementally, decoding
+        every Digital Thread as soon as it is parsed. The raw XML dicts are
+        kept to export the unmodified elements as they were read, so it
+        does not use less memory than a normal load: use
+        iterDigitalThreads() to hold a single Digital Thread at a time
+
+        Set lazy to True to decode the Operations, Files and Softwares of
+        the Digital Threads on first access. Elements never accessed are
+        exported as they were read, without a decode/encode cycle
+
+        Set workers to decode and encode the Digital Threads across that
+        many processes. Ignored with replicableIDs, which depend on the
+        order the IDs are generated
+
+        Set backend to the name of the XML backend used to parse and write
+        AML files: 'xmltodict' (default), 'etree' or 'lxml'
+
+        Set jsonBackend to the name of the JSON backend used to read and
+        write JSON files: 'json' (default), 'orjson' or 'ujson'. The faster
+        orjson and ujson write whole documents at once instead of chunk by
+        chunk, and non-ASCII characters without escaping them
+
+        Set cacheDir to a folder where the decoded files are cached, so
+        opening the same file again loads its snapshot instead of parsing
+        it. The cache is shared by the processes using the same folder
+
+        Set cacheSize to the maximum size in bytes of the cache folder, the
+        least recently used entries are evicted beyond it (1 GiB default).
+        See cacheStats() for the hits and misses
+
         :param input: path to the AML/JSON file or dict with the simplified AML
         :type input: str or dict
         '''
@@ -27,19 +73,27 @@ class MasterAML(MAMLDocument):
         # Use replicable IDs during development
         self.replicableIDs = replicableIDs
         if self.replicableIDs:
-            self.random = Random()
-            self.random.seed(0)
+            self.counter = MAMLIDCounter(seed=0)
 
-        # List of IDs used to avoid duplicates
-        self.IDs = []
+        self.lazy = lazy
+        self.workers = workers
+        self.backend = backend
+        self.jsonBackend = jsonBackend
+
+        # Set of IDs used to avoid duplicates
+        self.IDs = MAMLIDRegistry()
 
         self.doc = self
         self.filePath = None
+        self.cacheDir = cacheDir
 
         if type(input) is str:
             self.filePath = input
-            if '.aml' in input:
-                self.fromAML(input)
+            if cacheDir is not None:
+                self._fromCache_(
+                    input, getCache(cacheDir, cacheSize), streaming)
+            elif '.aml' in input:
+                self.fromAML(input, streaming=streaming)
             elif '.json' in input:
                 self.fromJSON(input)
 
@@ -49,62 +103,274 @@ class MasterAML(MAMLDocument):
         else:
             MAMLDocument.__init__(self, Document=self)
 
+    def _fromCache_(self, filePath: str, cache, streaming=False) -> None:
+        ''' Load a file from the cache, decoding and caching it on a miss '''
+        # Documents decoded with other options are cached apart
+        variant = f'-{int(self.lazy)}{int(self.replicableIDs)}'
+
+        # Settings of the current instance, not of the cached one
+        settings = {
+            k: self.__dict__[k]
+            for k in [
+                'filePath', 'workers', 'backend', 'jsonBackend', 'cacheDir',
+            ]
+        }
+
+        if cache.load(filePath, self, variant=variant):
+            self.__dict__.update(settings)
+            return
+
+        if '.aml' in filePath:
+            self.fromAML(filePath, streaming=streaming)
+        elif '.json' in filePath:
+            self.fromJSON(filePath)
+        else:
+            return
+        cache.save(filePath, self, variant=variant)
+
+    def cacheStats(self) -> dict:
+        '''
+        Returns the hit and miss counters and the size of the cache folder,
+        None without cacheDir
+
+        Counters are shared by the documents of the process using the same
+        cache folder
+        '''
+        if self.cacheDir is None:
+            return None
+        return getCache(self.cacheDir).stats()
+
     def newDigitalThread(self) -> MAMLDigitalThread:
         ''' Add and return an empty Digital Thread to the current MasterAML '''
         dt = MAMLDigitalThread(Document=self)
         self['Digital Threads'].append(dt)
+        self._indexElement_(dt)
         return dt
 
-    def export(self, filePath: str) -> None:
-        ''' Save to an AML or JSON according to the file extension '''
+    @classmethod
+    def iterDigitalThreads(
+        cls,
+        filePath: str,
+        match=None,
+        replicableIDs=False,
+    ):
+        '''
+        Yield the Digital Threads of an AML file one at a time
+
+        Only the current Digital Thread is kept in memory. It is linked to
+        an empty MasterAML holding just that thread, so findByID works
+        within it. IDs are registered per thread and released afterwards.
+
+        The libraries follow the Digital Threads in the files, so they are
+        read first in a quick pass skipping every InternalElement: the
+        Operations types of the threads are the ones of the file.
+
+        :param filePath: path to the AML file
+        :param match: optional filter called with the Name and ID of every
+            Digital Thread, the ones not matching are skipped without
+            being decoded
+        :type match: callable(str, str) -> bool
+        '''
+        doc = cls(replicableIDs=replicableIDs)
+
+        # Use the libraries of the file instead of the template ones
+        header = MAMLReader(filePath, keep=False, select=lambda attrs: False)
+        for _ in header:
+            pass
+        libs = header.xmld['CAEXFile'][0].get('SystemUnitClassLib')
+        if libs is not None:
+            doc._fixXMLDNullIDs_({'SystemUnitClassLib': libs})
+            doc.xmld['CAEXFile'][0]['SystemUnitClassLib'] = libs
+            doc.registerIDs(ID for ID, _ in findkey(libs, '@ID'))
+            doc._loadOperationsLib_()
+        snapshot = doc.IDs.snapshot()
+
+        def select(attrs: dict) -> bool:
+            if attrs.get('RefBaseSystemUnitPath') != \
+               'Structures/DigitalThread':
+                return False
+            return match is None or match(attrs.get('Name'), attrs.get('ID'))
+
+        reader = MAMLReader(filePath, keep=False, select=select)
+        for ie in reader:
+            if reader.hierarchy != 0:
+                continue
+            doc.IDs.restore(snapshot)
+            doc.IDIndex = {}
+            doc._operations_ = None
+            doc._timeline_ = None
+            doc._fixXMLDNullIDs_(ie)
+            dt = MAMLDigitalThread(Document=doc, inputXMLD=ie)
+            doc['Digital Threads'] = [dt]
+            yield dt
+
+    def export(self, filePath: str, compact=False) -> None:
+        '''
+        Save to an AML or JSON according to the file extension
+
+        :param compact: write JSON files without indentation
+        '''
         if '.aml' in filePath.lower():
             self.toAML(filePath)
         elif '.json' in filePath.lower():
-            self.toJSON(filePath)
+            self.toJSON(filePath, compact=compact)
         else:
             raise NotImplementedError(f'Unsupported export format: {filePath}')
 
-    def fromAML(self, filePath: str) -> None:
-        ''' Load AML file '''
-        xml = open(filePath, mode='r').read()
-        xmld = xmltodict.parse(xml, force_list=True)
+    def fromAML(self, filePath: str, streaming=False, backend=None) -> None:
+        '''
+        Load AML file, incrementally if streaming
+
+        :param backend: XML backend name, the one of the document if None
+        '''
+        backend = getBackend(backend or self.backend)
+        if streaming:
+            xmld = MAMLReader(filePath, parser=backend.iterparse)
+        else:
+            with openFile(filePath, mode='rb') as stream:
+                xmld = backend.parse(stream)
         MAMLDocument.__init__(self, Document=self, inputXMLD=xmld)
 
-    def toAML(self, filePath: str) -> None:
-        ''' Export current Master AML to an AML file '''
-        xmld = self._encode_()
-        xml = xmltodict.unparse(xmld, pretty=True)
-        open(filePath, mode='w').write(xml)
+    def toAML(self, filePath, streaming=False, backend=None) -> None:
+        '''
+        Export current Master AML to an AML file (gzipped if .gz)
+
+        If streaming, every Digital Thread is written as soon as it is
+        encoded, producing the same output with a lower peak memory. The
+        streaming writer always uses xmltodict
+
+        :param filePath: path to the AML file or writable text stream
+        :param backend: XML backend name, the one of the document if None
+        '''
+        if isinstance(filePath, str):
+            with openFile(filePath, mode='w') as stream:
+                return self.toAML(stream, streaming=streaming, backend=backend)
+
+        if streaming:
+            MAMLWriter(filePath).write(self)
+        else:
+            backend = getBackend(backend or self.backend)
+            backend.unparse(self._encode_(), filePath)
 
     def fromDict(self, d: dict) -> None:
         ''' Load AML from a simplified dictionary '''
         MAMLDocument.__init__(self, Document=self, inputSimpleDict=d)
+        # Plain dicts and lists are not tracked, see _findByID_
+        self._staleIDs_ = True
 
     def toDict(self) -> dict:
         ''' Export current Master AML as a simplified dictionary '''
+        for dt in self['Digital Threads']:
+            if isinstance(dt, MAMLDigitalThread):
+                dt.materialize()
         return dict(self)
 
-    def fromJSON(self, filePath: str) -> None:
-        ''' Load AML from a simplified dictionary stored in a JSON file '''
-        self.fromDict(json.load(open(filePath, mode='r')))
+    def fromJSON(self, filePath, backend=None) -> None:
+        '''
+        Load AML from a simplified dictionary stored in a JSON file
+
+        :param filePath: path to the JSON file (gzipped if .gz) or stream
+        :param backend: JSON backend name, the one of the document if None
+        '''
+        backend = getJSONBackend(backend or self.jsonBackend)
+        if isinstance(filePath, str):
+            with openFile(filePath, mode='rb') as stream:
+                return self.fromDict(backend.load(stream))
+        self.fromDict(backend.load(filePath))
+
+    def toJSON(self, filePath, compact=False, backend=None) -> None:
+        '''
+        Export current Master AML as a simplified dict to a JSON file
+
+        :param filePath: path to the JSON file (gzipped if .gz) or writable
+            stream
+        :param compact: skip the indentation, roughly halving the size
+        :param backend: JSON backend name, the one of the document if None
+        '''
+        backend = getJSONBackend(backend or self.jsonBackend)
+        if isinstance(filePath, str):
+            with openFile(filePath, mode='wb') as stream:
+                return backend.dump(self.toDict(), stream, compact=compact)
+        backend.dump(self.toDict(), filePath, compact=compact)
+
+    def saveSnapshot(self, filePath) -> None:
+        '''
+        Save the decoded document to a binary snapshot, gzipped if .gz
+
+        Reloading a snapshot with loadSnapshot skips the XML parsing, the
+        templates and the links resolution
+
+        :param filePath: path to the snapshot file or writable binary stream
+        '''
+        if isinstance(filePath, str):
+            with openFile(filePath, mode='wb') as stream:
+                return dumpSnapshot(self, stream)
+        dumpSnapshot(self, filePath)
+
+    @classmethod
+    def loadSnapshot(cls, filePath):
+        '''
+        Returns the MasterAML stored in a snapshot made by saveSnapshot
+
+        Raises ValueError if the snapshot is corrupted or was made by
+        another version of pyMAML
 
-    def toJSON(self, filePath: str) -> None:
-        ''' Export current Master AML as a simplified dict to a JSON file '''
-        json.dump(self.toDict(), open(filePath, mode='w'), indent=2)
+        :param filePath: path to the snapshot file or readable binary stream
+        '''
+        if isinstance(filePath, str):
+            with openFile(filePath, mode='rb') as stream:
+                return cls.loadSnapshot(stream)
+        doc = loadSnapshot(filePath)
+        if not isinstance(doc, cls):
+            raise ValueError(f'Snapshot does not contain a {cls.__name__}')
+        return doc
 
     def registerID(self, ID: str) -> None:
         ''' Save IDs to avoid duplicates '''
-        if str(ID) not in self.IDs:
-            self.IDs.append(str(ID))
+        self.IDs.register(ID)
+
+    def registerIDs(self, IDs) -> None:
+        ''' Save all the IDs from an iterable to avoid duplicates '''
+        self.IDs.registerMany(IDs)
+
+    def snapshotIDs(self) -> tuple:
+        ''' Returns the current state of the ID registry and generator '''
+        state = self.counter.getstate() if self.replicableIDs else None
+        return self.IDs.snapshot(), state
+
+    def restoreIDs(self, snapshot: tuple) -> None:
+        ''' Restore the ID registry and generator from snapshotIDs() '''
+        IDs, state = snapshot
+        self.IDs.restore(IDs)
+        if self.replicableIDs and state is not None:
+            self.counter.setstate(state)
 
     def generateID(self) -> str:
         ''' Returns a new unique ID '''
-        while True:
+        return self.generateIDs(1)[0]
+
+    def generateIDs(self, n: int) -> list:
+        '''
+        Returns a list of n new unique IDs, registered in a single update
+
+        Replicable IDs come from a counter, so they are only skipped when
+        already used by a loaded file
+        '''
+        IDs = []
+        while len(IDs) < n:
             if self.replicableIDs:
-                id = str(UUID(int=self.random.getrandbits(16), version=4))
+                id = self.counter.next()
             else:
                 id = str(uuid4())
             if id in self.IDs:
                 continue
-            self.registerID(id)
-            return id
+            IDs.append(id)
+        self.registerIDs(IDs)
+        return IDs
+
+
+def openFile(filePath: str, mode: str = 'r'):
+    ''' Open a file, transparently (de)compressing .gz files '''
+    if filePath.lower().endswith('.gz'):
+        return gzip.open(filePath, mode=mode if 'b' in mode else mode + 't')
+    return open(filePath, mode=mode)
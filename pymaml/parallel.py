@@ -0,0 +1,142 @@
+import io
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from .ids import MAMLIDLayer
+
+
+class MAMLPickler(pickle.Pickler):
+    '''
+    Pickler replacing a document by a reference
+
+    Elements link their document, which must not be copied along with
+    them: it is restored as the document of the receiving process
+    '''
+
+    def __init__(self, file, doc) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.doc = doc
+
+    def persistent_id(self, obj):
+        return 'doc' if obj is self.doc else None
+
+
+class MAMLUnpickler(pickle.Unpickler):
+    ''' Unpickler linking the elements to the given document '''
+
+    def __init__(self, file, doc) -> None:
+        super().__init__(file)
+        self.doc = doc
+
+    def persistent_load(self, pid):
+        if pid != 'doc':
+            raise pickle.UnpicklingError(f'Unknown persistent ID: {pid}')
+        return self.doc
+
+
+def dumps(obj, doc) -> bytes:
+    ''' Pickle obj, replacing doc by a reference '''
+    f = io.BytesIO()
+    MAMLPickler(f, doc).dump(obj)
+    return f.getvalue()
+
+
+def loads(data: bytes, doc):
+    ''' Unpickle data, linking the elements to doc '''
+    return MAMLUnpickler(io.BytesIO(data), doc).load()
+
+
+class MAMLProcessPool():
+    '''
+    Process pool decoding and encoding the Digital Threads of a document
+
+    Every worker holds an empty document with the IDs registered in the
+    main one and its Operations library. The IDs registered by a worker
+    while handling a Digital Thread are sent back and merged, and any
+    collision with the IDs registered meanwhile makes that Digital Thread
+    be handled again in the main process, so IDs stay unique.
+    '''
+
+    def __init__(self, doc, workers: int) -> None:
+        self.doc = doc
+        self.workers = workers
+
+        # Digital Threads handled again in the main process
+        self.collisions = 0
+
+    def _executor_(self) -> ProcessPoolExecutor:
+        doc = self.doc
+        lib = getattr(doc, 'OperationsLib', None)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_initWorker_,
+            initargs=(
+                type(doc),
+                doc.IDs.snapshot(),
+                None if lib is None else dumps(lib, doc),
+                doc.lazy,
+            ),
+        )
+
+    def _merge_(self, IDs: set) -> bool:
+        ''' Register the IDs of a worker, False if any was already used '''
+        if not self.doc.IDs.isdisjoint(IDs):
+            self.collisions += 1
+            return False
+        self.doc.IDs.update(IDs)
+        return True
+
+    def decode(self, ies: list):
+        ''' Decode InternalElements into Digital Threads, keeping order '''
+        from .elements.dt import MAMLDigitalThread
+
+        with self._executor_() as pool:
+            for ie, (data, IDs) in zip(ies, pool.map(_decodeWorker_, ies)):
+                if self._merge_(IDs):
+                    yield loads(data, self.doc)
+                else:
+                    yield MAMLDigitalThread(Document=self.doc, inputXMLD=ie)
+
+    def encode(self, dts: list, encode):
+        '''
+        Encode Digital Threads into XML dicts, keeping order
+
+        :param encode: function encoding a Digital Thread in the main
+            process, used on ID collisions
+        '''
+        with self._executor_() as pool:
+            tasks = [dumps(dt, self.doc) for dt in dts]
+            for dt, (xmld, IDs) in zip(dts, pool.map(_encodeWorker_, tasks)):
+                if self._merge_(IDs):
+                    yield xmld
+                else:
+                    yield encode(dt)
+
+
+# Document of the current worker process
+_document_ = None
+
+
+def _initWorker_(cls, IDs: frozenset, lib: bytes, lazy: bool) -> None:
+    global _document_
+    _document_ = cls()
+    _document_.IDs = MAMLIDLayer(IDs)
+    _document_.lazy = lazy
+    if lib is not None:
+        _document_.OperationsLib = loads(lib, _document_)
+
+
+def _decodeWorker_(ie: dict) -> tuple:
+    from .elements.dt import MAMLDigitalThread
+
+    doc = _document_
+    doc.IDs.clear()
+    dt = MAMLDigitalThread(Document=doc, inputXMLD=ie)
+    return dumps(dt, doc), set(doc.IDs)
+
+
+def _encodeWorker_(data: bytes) -> tuple:
+    doc = _document_
+    doc.IDs.clear()
+    xmld = doc._encodeDigitalThread_(loads(data, doc))
+    return xmld, set(doc.IDs)
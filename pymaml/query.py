@@ -0,0 +1,339 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+
+class MAMLOperationIndex():
+    '''
+    Hash indexes of the Operations of a Master AML document by their fields
+
+    Every field maps each of its values to the set of Operations having it,
+    so where() intersects a few sets instead of scanning every Digital
+    Thread. Operations are numbered in document order, which is also the
+    order of the results
+
+    The index is built in a single pass and kept up to date by the MAML
+    elements: new Operations, operation types and changes of the indexed
+    fields. Removing Operations or Digital Threads marks it as stale, and
+    it is built again on the next query. Operations loaded as plain dicts
+    (e.g. from a JSON file) are not tracked, call rebuild() after
+    modifying them
+    '''
+
+    # Indexed fields, Username is read from the UserInfo
+    FIELDS = ('Module', 'Type', 'Stage', 'Step', 'Success', 'Username')
+
+    # Operations were removed since built, see MAMLDocument._staleOperations_
+    stale = False
+
+    def __init__(self, doc) -> None:
+        self.doc = doc
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        ''' Index every Operation of the document, decoding pending ones '''
+        self.stale = False
+        self.operations = []
+        self.serials = {}
+        self.indexes = {field: {} for field in self.FIELDS}
+        for dt in self.doc['Digital Threads']:
+            for op in dt['Operations']:
+                self.add(op)
+
+    def add(self, op: dict) -> None:
+        ''' Index a new Operation '''
+        if self.stale:
+            return
+        serial = len(self.operations)
+        self.operations.append(op)
+        self.serials[id(op)] = serial
+        for field in self.FIELDS:
+            self._bucket_(field, self._get_(op, field)).add(serial)
+
+    def update(self, op: dict, field: str, old, new) -> None:
+        ''' Move an indexed Operation after one of its fields changed '''
+        serial = self.serials.get(id(op))
+        if self.stale or serial is None or field not in self.indexes:
+            return
+        self._bucket_(field, old).discard(serial)
+        self._bucket_(field, new).add(serial)
+
+    def where(self, **criteria) -> list:
+        '''
+        Returns the Operations matching every field=value criteria
+
+        Success accepts booleans as well as 'true' and 'false', and
+        Username matches the one of the UserInfo. Without criteria, every
+        Operation is returned
+        '''
+        self._refresh_()
+        if not criteria:
+            return list(self.operations)
+        buckets = []
+        for field, value in criteria.items():
+            if field not in self.indexes:
+                raise KeyError(f'Operations are not indexed by {field}')
+            bucket = self.indexes[field].get(self._key_(value))
+            if not bucket:
+                return []
+            buckets.append(bucket)
+
+        # Intersect starting from the smallest set
+        buckets.sort(key=len)
+        serials = buckets[0].intersection(*buckets[1:])
+        return [self.operations[serial] for serial in sorted(serials)]
+
+    def count(self, **criteria) -> int:
+        ''' Returns the number of Operations matching the criteria '''
+        return len(self.where(**criteria))
+
+    def values(self, field: str) -> dict:
+        ''' Returns the number of Operations for every value of a field '''
+        self._refresh_()
+        return {
+            value: len(serials)
+            for value, serials in self.indexes[field].items()
+            if serials
+        }
+
+    def __len__(self) -> int:
+        self._refresh_()
+        return len(self.operations)
+
+    def __iter__(self):
+        self._refresh_()
+        return iter(self.operations)
+
+    def _refresh_(self) -> None:
+        ''' Build the index again if Operations were removed '''
+        if self.stale:
+            self.rebuild()
+
+    def __getstate__(self) -> dict:
+        ''' Pickle support: object identities are only valid in a process '''
+        state = dict(self.__dict__)
+        del state['serials']
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self.serials = {id(op): n for n, op in enumerate(self.operations)}
+
+    def _bucket_(self, field: str, value) -> set:
+        ''' Returns the set of Operations with a value of a field '''
+        return self.indexes[field].setdefault(self._key_(value), set())
+
+    @staticmethod
+    def _get_(op: dict, field: str):
+        ''' Returns the value of an indexed field of an Operation '''
+        if field == 'Username':
+            userInfo = op.get('UserInfo')
+            return userInfo.get('Username') if userInfo else None
+        return op.get(field)
+
+    @staticmethod
+    def _key_(value):
+        ''' Returns the hashable index key of a value '''
+        if value is True or value is False:
+            return str(value).lower()
+        try:
+            hash(value)
+        except TypeError:
+            return repr(value)
+        return value
+
+
+class MAMLTimeline():
+    '''
+    Operations of a Master AML document sorted by their UserInfo.Timestamp
+
+    Timestamps are parsed once, when the Operations are indexed, and kept
+    in sorted lists, globally and per Digital Thread, so range queries are
+    two bisections. Operations without a valid timestamp are kept apart,
+    see undated
+
+    Like MAMLOperationIndex, it is built in a single pass and kept up to
+    date by the MAML elements, built again on the next query once
+    Operations are removed. Call rebuild() after modifying plain dicts
+    '''
+
+    # Operations were removed since built, see MAMLDocument._staleOperations_
+    stale = False
+
+    def __init__(self, doc) -> None:
+        self.doc = doc
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        ''' Index every Operation of the document, decoding pending ones '''
+        self.stale = False
+        self.times = []
+        self.operations = []
+        self._undated_ = []
+        # Sorted times and Operations of every Digital Thread ID
+        self.threads = {}
+
+        # Sort once, keeping the document order of the same times
+        dated = []
+        for dt in self.doc['Digital Threads']:
+            for op in dt['Operations']:
+                time = self._time_(op)
+                if time is None:
+                    self._undated_.append(op)
+                else:
+                    dated.append((time, self._thread_(op, dt), op))
+        dated.sort(key=lambda entry: entry[0])
+        for time, threadID, op in dated:
+            self.times.append(time)
+            self.operations.append(op)
+            times, operations = self.threads.setdefault(threadID, ([], []))
+            times.append(time)
+            operations.append(op)
+
+    def add(self, op: dict, dt: dict = None) -> None:
+        ''' Index a new Operation of the Digital Thread dt '''
+        if self.stale:
+            return
+        self._insert_(op, self._thread_(op, dt), self._time_(op))
+
+    def update(self, op: dict, field: str, old, new) -> None:
+        ''' Move an indexed Operation after its timestamp changed '''
+        if self.stale or field != 'Timestamp':
+            return
+        threadID = self._thread_(op)
+        if self._delete_(op, threadID, parseTimestamp(old)):
+            self._insert_(op, threadID, parseTimestamp(new))
+
+    def between(self, start=None, end=None, dt=None) -> list:
+        '''
+        Returns the Operations from start to end, both included, sorted
+
+        :param start: datetime or timestamp string, from the first if None
+        :param end: datetime or timestamp string, to the last if None
+        :param dt: Digital Thread or its ID, all of them if None
+        '''
+        times, operations = self._lists_(dt)
+        first = 0
+        last = len(times)
+        if start is not None:
+            first = bisect_left(times, self._bound_(start))
+        if end is not None:
+            last = bisect_right(times, self._bound_(end))
+        return operations[first:last]
+
+    def latest(self, n: int = 1, dt=None) -> list:
+        '''
+        Returns the n most recent Operations, the most recent first
+
+        :param dt: Digital Thread or its ID, all of them if None
+        '''
+        _, operations = self._lists_(dt)
+        return operations[:-n - 1:-1] if n > 0 else []
+
+    def windows(self, start=None, end=None) -> dict:
+        ''' Returns the Operations from start to end of every thread ID '''
+        self._refresh_()
+        return {
+            threadID: self.between(start, end, dt=threadID)
+            for threadID in self.threads
+        }
+
+    @property
+    def undated(self) -> list:
+        ''' Returns the Operations without a valid timestamp '''
+        self._refresh_()
+        return self._undated_
+
+    def __len__(self) -> int:
+        self._refresh_()
+        return len(self.operations)
+
+    def __iter__(self):
+        self._refresh_()
+        return iter(self.operations)
+
+    def _refresh_(self) -> None:
+        ''' Build the index again if Operations were removed '''
+        if self.stale:
+            self.rebuild()
+
+    def _lists_(self, dt) -> tuple:
+        ''' Returns the sorted times and Operations of a thread or all '''
+        self._refresh_()
+        if dt is None:
+            return self.times, self.operations
+        threadID = dt.get('ID') if isinstance(dt, dict) else dt
+        return self.threads.get(threadID, ([], []))
+
+    def _insert_(self, op: dict, threadID, time) -> None:
+        ''' Insert an Operation after the ones with the same time '''
+        if time is None:
+            self._undated_.append(op)
+            return
+        thread = self.threads.setdefault(threadID, ([], []))
+        for times, operations in [(self.times, self.operations), thread]:
+            i = bisect_right(times, time)
+            times.insert(i, time)
+            operations.insert(i, op)
+
+    def _delete_(self, op: dict, threadID, time) -> bool:
+        ''' Remove an Operation stored with a time, False if not found '''
+        if time is None:
+            for i, undated in enumerate(self._undated_):
+                if undated is op:
+                    del self._undated_[i]
+                    return True
+            return False
+        found = False
+        for times, operations in [
+            (self.times, self.operations),
+            self.threads.get(threadID, ([], [])),
+        ]:
+            for i in range(
+                bisect_left(times, time), bisect_right(times, time)
+            ):
+                if operations[i] is op:
+                    del times[i]
+                    del operations[i]
+                    found = True
+                    break
+        return found
+
+    @staticmethod
+    def _thread_(op: dict, dt: dict = None):
+        ''' Returns the ID of the Digital Thread of an Operation '''
+        if dt is None:
+            dt = getattr(op, 'dt', None)
+        return dt.get('ID') if dt is not None else None
+
+    @staticmethod
+    def _time_(op: dict):
+        ''' Returns the parsed timestamp of an Operation '''
+        userInfo = op.get('UserInfo')
+        return parseTimestamp(userInfo.get('Timestamp') if userInfo else None)
+
+    @staticmethod
+    def _bound_(value) -> datetime:
+        ''' Returns a query bound as a datetime '''
+        time = parseTimestamp(value)
+        if time is None:
+            raise ValueError(f'Invalid timestamp: {value}')
+        return time
+
+
+def parseTimestamp(value) -> datetime:
+    '''
+    Returns a timestamp as a naive UTC datetime, None if invalid
+
+    Accepts datetimes and ISO 8601 strings, those with a time zone are
+    converted to UTC and the ones without are considered UTC
+    '''
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,293 @@
+import gzip
+from xml.etree.ElementTree import iterparse
+
+
+# Namespace URIs always bound to a prefix
+DEFAULT_PREFIXES = {'http://www.w3.org/XML/1998/namespace': 'xml'}
+
+
+class MAMLReader():
+    '''
+    Incremental AML reader based on iterparse
+
+    Iterating over the reader yields the XML dict of every InternalElement
+    of the InstanceHierarchies as soon as its closing tag is parsed, and
+    frees the parsed subtree. The rest of the document is collected in
+    self.xmld, using the same force_list shape as xmltodict.
+    '''
+
+    def __init__(
+        self,
+        # Path to the AML file (optionally gzipped) or binary stream
+        source,
+        # Keep the yielded InternalElements in self.xmld
+        keep: bool = True,
+        # Optional filter receiving the InternalElement XML @Attributes
+        select=None,
+        # iterparse implementation (xml.etree or lxml.etree)
+        parser=iterparse,
+    ) -> None:
+        self.source = source
+        self.keep = keep
+        self.select = select
+        self.parser = parser
+
+        # XML dict of the document, filled while iterating
+        self.xmld = {}
+
+        # Index of the InstanceHierarchy being parsed
+        self.hierarchy = -1
+
+    def __iter__(self):
+        ''' Yield the InstanceHierarchy InternalElements one by one '''
+        if isinstance(self.source, str):
+            if self.source.lower().endswith('.gz'):
+                stream = gzip.open(self.source, mode='rb')
+            else:
+                stream = open(self.source, mode='rb')
+        else:
+            stream = self.source
+
+        try:
+            yield from self._parse_(stream)
+        finally:
+            if stream is not self.source:
+                stream.close()
+
+    def _parse_(self, stream):
+        # Stack of the open elements, the root and the InstanceHierarchies
+        # are live levels: their XML dicts are filled child by child, while
+        # the rest of the elements are converted when they end
+        stack = []
+        declarations = []
+        nsmap = {}
+        skipping = 0
+
+        events = self.parser(stream, events=('start', 'end', 'start-ns'))
+        for event, elem in events:
+            if event == 'start-ns':
+                declarations.append(elem)
+                continue
+
+            if event == 'start':
+                prefixes = stack[-1].prefixes if stack else DEFAULT_PREFIXES
+                if declarations:
+                    nsmap[elem] = namespacesToXMLD(declarations)
+                    prefixes = dict(prefixes)
+                    prefixes.update((uri, p) for p, uri in declarations)
+                    declarations = []
+                level = _level_(elem, prefixes)
+
+                if skipping:
+                    skipping += 1
+                elif not stack or (
+                    len(stack) == 1 and
+                    qualifiedName(elem.tag, prefixes) == 'InstanceHierarchy'
+                ):
+                    level.xmld = attributesToXMLD(
+                        elem, prefixes, nsmap.get(elem)) or {}
+                    name = qualifiedName(elem.tag, prefixes)
+                    if not stack:
+                        self.xmld = {name: [level.xmld]}
+                    else:
+                        self.hierarchy += 1
+                        pushXMLD(stack[0].xmld, name, level.xmld)
+                elif self.select is not None and self._isInternalElement_(
+                        stack, qualifiedName(elem.tag, prefixes)):
+                    attrs = attributesToXMLD(elem, prefixes, None) or {}
+                    if not self.select({k[1:]: v for k, v in attrs.items()}):
+                        skipping = 1
+
+                stack.append(level)
+                continue
+
+            # End event
+            level = stack.pop()
+            parent = stack[-1] if stack else None
+
+            if skipping:
+                # Discard the subtrees rejected by the select filter
+                skipping -= 1
+                clearElement(elem)
+                if not skipping:
+                    parent.release(elem)
+                continue
+
+            name = qualifiedName(elem.tag, level.prefixes)
+
+            if level.xmld is not None:
+                # Live element: add its text once every child is parsed
+                level.release(None)
+                data = joinText(elem.text, level.tails)
+                if level.xmld:
+                    if data:
+                        pushXMLD(level.xmld, '#text', data)
+                elif parent is not None:
+                    # No attributes nor children: xmltodict keeps the text
+                    parent.xmld[name][-1] = data
+                else:
+                    self.xmld[name] = [data]
+                if parent is not None:
+                    parent.release(elem)
+                nsmap.pop(elem, None)
+                continue
+
+            if parent is None or parent.xmld is None:
+                # Nested element, converted together with its ancestor
+                continue
+
+            xmld = elementToXMLD(elem, parent.prefixes, nsmap)
+            isIE = self._isInternalElement_(stack, name)
+            if not isIE or self.keep:
+                pushXMLD(parent.xmld, name, xmld)
+            parent.release(elem)
+            clearElement(elem)
+            nsmap.pop(elem, None)
+            if isIE:
+                yield xmld
+
+    def _isInternalElement_(self, stack, name) -> bool:
+        ''' Check if the element is an InstanceHierarchy InternalElement '''
+        return (
+            name == 'InternalElement' and
+            len(stack) == 2 and
+            stack[1].xmld is not None
+        )
+
+
+class _level_():
+    ''' Open element while parsing '''
+
+    __slots__ = ('elem', 'prefixes', 'xmld', 'previous', 'tails')
+
+    def __init__(self, elem, prefixes: dict) -> None:
+        self.elem = elem
+        self.prefixes = prefixes
+        # Only live levels have an XML dict
+        self.xmld = None
+        self.previous = None
+        self.tails = []
+
+    def release(self, child) -> None:
+        '''
+        Free the previous child of a live element
+
+        Children are released one step later to read their tail text,
+        which is only known once the parser reaches the next tag
+        '''
+        if self.previous is not None:
+            if self.previous.tail:
+                self.tails.append(self.previous.tail)
+            self.elem.remove(self.previous)
+        self.previous = child
+
+
+def parseXMLD(source, parser=iterparse) -> dict:
+    '''
+    Parse a whole XML file into a force_list XML dict
+
+    Faster than iterating over a MAMLReader when the whole document is
+    needed: the tree is built by the parser and converted at once, only
+    the namespace declarations are collected while parsing
+    '''
+    nsmap = {}
+    declarations = []
+    events = parser(source, events=('start-ns', 'start'))
+    for event, elem in events:
+        if event == 'start-ns':
+            declarations.append(elem)
+        elif declarations:
+            nsmap[elem] = namespacesToXMLD(declarations)
+            declarations = []
+
+    root = events.root
+    prefixes = dict(DEFAULT_PREFIXES)
+    prefixes.update((uri, k[7:]) for k, uri in nsmap.get(root, {}).items())
+    return {
+        qualifiedName(root.tag, prefixes):
+            [elementToXMLD(root, DEFAULT_PREFIXES, nsmap)]
+    }
+
+
+def clearElement(elem) -> None:
+    ''' Free the content of a parsed element, keeping its tail text '''
+    tail = elem.tail
+    elem.clear()
+    elem.tail = tail
+
+
+def qualifiedName(name: str, prefixes: dict) -> str:
+    ''' Translate {uri}name into prefix:name as written in the file '''
+    if name[0] != '{':
+        return name
+    uri, local = name[1:].split('}', 1)
+    prefix = prefixes.get(uri)
+    if not prefix:
+        return local
+    return f'{prefix}:{local}'
+
+
+def namespacesToXMLD(declarations: list) -> dict:
+    ''' Returns the xmlns @Attributes of the namespace declarations '''
+    return {
+        '@xmlns' if not prefix else f'@xmlns:{prefix}': uri
+        for prefix, uri in declarations
+    }
+
+
+def attributesToXMLD(elem, prefixes: dict, attrs: dict) -> dict:
+    ''' Returns the XML dict @Attributes of an element or None '''
+    result = dict(attrs) if attrs else {}
+    for k, v in elem.attrib.items():
+        result['@' + qualifiedName(k, prefixes)] = v
+    return result or None
+
+
+def joinText(text: str, tails: list) -> str:
+    ''' Join and strip the text chunks of an element like xmltodict '''
+    data = ''.join([text or ''] + [t for t in tails if t])
+    return data.strip() or None
+
+
+def pushXMLD(xmld: dict, name: str, value) -> None:
+    ''' Append a child to an XML dict using the force_list shape '''
+    try:
+        xmld[name].append(value)
+    except KeyError:
+        xmld[name] = [value]
+
+
+def elementToXMLD(elem, prefixes: dict, nsmap: dict = None):
+    '''
+    Convert an ElementTree element into a force_list XML dict
+
+    :param prefixes: dict of the namespace URIs and prefixes in scope
+    :param nsmap: dict of the elements declaring namespaces and their xmlns
+        @Attributes
+    '''
+    attrs = None
+    if nsmap and elem in nsmap:
+        attrs = nsmap[elem]
+        prefixes = dict(prefixes)
+        prefixes.update((uri, k[7:]) for k, uri in attrs.items())
+
+    item = attributesToXMLD(elem, prefixes, attrs)
+    tails = []
+    for child in elem:
+        tails.append(child.tail)
+        if not isinstance(child.tag, str):
+            # Comments and processing instructions
+            continue
+        if item is None:
+            item = {}
+        pushXMLD(
+            item,
+            qualifiedName(child.tag, prefixes),
+            elementToXMLD(child, prefixes, nsmap))
+
+    data = joinText(elem.text, tails)
+    if item is None:
+        return data
+    if data:
+        item['#text'] = [data]
+    return item
@@ -0,0 +1,111 @@
+import io
+import json
+import pickle
+import struct
+from glob import glob
+from hashlib import sha256
+from os.path import dirname, join, relpath
+
+from .parallel import MAMLPickler, MAMLUnpickler
+
+
+# File signature and format version of the snapshots
+MAGIC = b'PYMAMLSN'
+VERSION = 1
+
+# Header length, stored after the signature
+_LENGTH_ = struct.Struct('>I')
+
+_libraryHash_ = None
+
+
+def libraryHash() -> str:
+    '''
+    Returns the hash of the pyMAML sources and templates
+
+    Snapshots store pickled element classes, so the ones made by any other
+    version of the library are considered stale
+    '''
+    global _libraryHash_
+    if _libraryHash_ is None:
+        root = dirname(__file__)
+        h = sha256()
+        for ext in ['py', 'json']:
+            files = glob(join(root, '**', f'*.{ext}'), recursive=True)
+            for f in sorted(files):
+                h.update(relpath(f, root).encode('utf-8'))
+                with open(f, mode='rb') as stream:
+                    h.update(stream.read())
+        _libraryHash_ = h.hexdigest()
+    return _libraryHash_
+
+
+def dumpSnapshot(doc, stream) -> None:
+    '''
+    Write a decoded document to a binary stream
+
+    The snapshot is a signature, a JSON header and the document pickled
+    with protocol 5: simplified dict, XML dicts, ID registry, ID index
+    and Operations library. The document itself is pickled by reference,
+    so its state can be restored into an existing instance
+    '''
+    f = io.BytesIO()
+    pickle.dump(type(doc), f, protocol=5)
+    MAMLPickler(f, doc).dump((doc.__dict__, dict(doc)))
+    payload = f.getvalue()
+    header = json.dumps({
+        'version': VERSION,
+        'library': libraryHash(),
+        'sha256': sha256(payload).hexdigest(),
+        'size': len(payload),
+    }).encode('utf-8')
+
+    stream.write(MAGIC)
+    stream.write(_LENGTH_.pack(len(header)))
+    stream.write(header)
+    stream.write(payload)
+
+
+def readHeader(stream) -> dict:
+    ''' Returns the header of a snapshot, raises ValueError if invalid '''
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError('Not a pyMAML snapshot')
+    try:
+        length, = _LENGTH_.unpack(stream.read(_LENGTH_.size))
+        header = json.loads(stream.read(length))
+    except (struct.error, ValueError):
+        raise ValueError('Corrupted pyMAML snapshot header')
+    if header.get('version') != VERSION:
+        raise ValueError(
+            f'Unsupported snapshot version: {header.get("version")}')
+    if header.get('library') != libraryHash():
+        raise ValueError('Stale snapshot made by another pyMAML version')
+    return header
+
+
+def loadSnapshot(stream, doc=None):
+    '''
+    Returns the document stored in a binary stream
+
+    Raises ValueError if the snapshot is invalid, stale or corrupted
+
+    :param doc: document to restore the snapshot into, a new one if None
+    '''
+    header = readHeader(stream)
+    payload = stream.read()
+    if len(payload) != header['size'] or \
+       sha256(payload).hexdigest() != header['sha256']:
+        raise ValueError('Corrupted pyMAML snapshot')
+
+    f = io.BytesIO(payload)
+    cls = pickle.load(f)
+    if doc is None:
+        doc = cls.__new__(cls)
+    elif not isinstance(doc, cls):
+        raise ValueError(f'Snapshot does not contain a {type(doc).__name__}')
+
+    attrs, items = MAMLUnpickler(f, doc).load()
+    doc.__dict__.update(attrs)
+    dict.clear(doc)
+    dict.update(doc, items)
+    return doc
@@ -0,0 +1,50 @@
+import xmltodict
+from uuid import uuid4
+
+
+class MAMLWriter():
+    '''
+    Streaming AML writer
+
+    Writes the CAEXFile header and libraries, then encodes and writes every
+    Digital Thread as soon as it is produced, without building the whole
+    XML dict or string. The output is identical to
+    xmltodict.unparse(pretty=True) of the encoded document.
+    '''
+
+    def __init__(
+        self,
+        # Writable text stream
+        stream,
+    ) -> None:
+        self.stream = stream
+
+    def write(self, doc) -> None:
+        ''' Encode and write a MAMLDocument '''
+        header = doc._encodeHeader_()
+
+        # Render the header with a placeholder Digital Thread
+        marker = str(uuid4())
+        ih = header['CAEXFile'][0]['InstanceHierarchy'][0]
+        ih['InternalElement'].append({'@ID': marker})
+        try:
+            xml = xmltodict.unparse(header, pretty=True)
+        finally:
+            ih['InternalElement'].pop()
+
+        # Split the header around the placeholder line
+        position = xml.index(f'<InternalElement ID="{marker}"')
+        start = xml.rindex('\n', 0, position) + 1
+        end = xml.index('\n', position) + 1
+        depth = position - start
+
+        self.stream.write(xml[:start])
+        for xmld in doc._encodeDigitalThreads_():
+            xmltodict.unparse(
+                {'InternalElement': xmld},
+                output=self.stream,
+                full_document=False,
+                pretty=True,
+                depth=depth,
+            )
+        self.stream.write(xml[end:])
@@ -0,0 +1,71 @@
+import io
+from pymaml.backends import getBackend, availableBackends, DEFAULT_BACKEND
+from pymaml.backends import getJSONBackend, availableJSONBackends
+
+
+class BackendParityTest():
+    ''' Check that every installed XML backend is interchangeable '''
+
+    def __init__(self, filePath) -> None:
+        self.filePath = filePath
+        self.reference = getBackend(DEFAULT_BACKEND)
+        with open(filePath, mode='rb') as f:
+            self.xml = f.read()
+        self.xmld = self.reference.parse(io.BytesIO(self.xml))
+
+    def validate(self) -> bool:
+        result = True
+        for name in availableBackends():
+            backend = getBackend(name)
+
+            # Parsing must return the same XML dict
+            parsed = backend.parse(io.BytesIO(self.xml)) == self.xmld
+
+            # Serializing must be read back as the same XML dict
+            output = io.StringIO()
+            backend.unparse(self.xmld, output)
+            reparsed = self.reference.parse(
+                io.BytesIO(output.getvalue().encode('utf-8')))
+
+            if parsed and reparsed == self.xmld:
+                print(f'Backend {name} matches! --> {self.filePath}')
+            else:
+                print(f'Backend {name} differs! --> {self.filePath}')
+                result = False
+        return result
+
+
+class JSONBackendParityTest():
+    ''' Check that every installed JSON backend is interchangeable '''
+
+    def __init__(self, filePath) -> None:
+        self.filePath = filePath
+        with open(filePath, mode='rb') as f:
+            self.data = getJSONBackend('json').load(f)
+
+    def validate(self) -> bool:
+        result = True
+        for name in availableJSONBackends():
+            backend = getJSONBackend(name)
+            loaded = []
+            for compact in [False, True]:
+                output = io.BytesIO()
+                backend.dump(self.data, output, compact=compact)
+                output.seek(0)
+                loaded.append(backend.load(output))
+
+            if all(x == self.data for x in loaded):
+                print(f'JSON backend {name} matches! --> {self.filePath}')
+            else:
+                print(f'JSON backend {name} differs! --> {self.filePath}')
+                result = False
+        return result
+
+
+if __name__ == '__main__':
+    from sys import argv, exit
+    tests = [
+        JSONBackendParityTest(f) if '.json' in f else BackendParityTest(f)
+        for f in argv[1:]
+    ]
+    exit(0 if all([test.validate() for test in tests]) else 1)
@@ -0,0 +1,348 @@
+import gc
+import json
+import platform
+import subprocess
+import tracemalloc
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+# correct the path to the root of the library
+from sys import path
+from os.path import dirname, join, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+from pymaml.backends import availableBackends, availableJSONBackends
+from pymaml.elements.base import findkeys
+from pymaml.lineage import MAMLLineage
+from pymaml.query import parseTimestamp
+
+
+def generate(
+    threads: int = 10,
+    operations: int = 10,
+    files: int = 2,
+    links: int = 1,
+    replicableIDs: bool = True,
+) -> MasterAML:
+    '''
+    Generate a deterministic synthetic Master AML
+
+    Every Digital Thread has a chain of Operations, each one with its own
+    input files, an output file and a software. The first links outputs of
+    the previous Operations are reused as inputs, adding InternalLinks
+    between Operations and existing Files.
+
+    :param threads: number of Digital Threads
+    :param operations: number of Operations per Digital Thread
+    :param files: number of new input files per Operation
+    :param links: number of previous outputs reused as inputs per Operation
+    :param replicableIDs: generate the same IDs on every run
+    '''
+    aml = MasterAML(replicableIDs=replicableIDs)
+    types = list(aml.OperationsLib) or [None]
+
+    for t in range(threads):
+        dt = aml.newDigitalThread()
+        dt['Name'] = f'Thread {t}'
+        outputs = []
+
+        for o in range(operations):
+            op = dt.newOperation()
+            op['Name'] = f'Operation {t}.{o}'
+            op['Success'] = 'true'
+            op['UserInfo']['Username'] = 'benchmark'
+            op['UserInfo']['Timestamp'] = \
+                f'2023-01-01T{o // 3600 % 24:02}:{o // 60 % 60:02}:{o % 60:02}'
+            op.setOperationType(types[o % len(types)])
+
+            for f in range(files):
+                inputFile = op.newInputFile()
+                inputFile['Name'] = f'input_{t}_{o}_{f}.csv'
+            for ID in outputs[-links:] if links else []:
+                op['InputFile'].append(ID)
+
+            outputFile = op.newOutputFile()
+            outputFile['Name'] = f'output_{t}_{o}.csv'
+            outputs.append(outputFile['ID'])
+
+            sw = op.newSoftwareUsed()
+            sw['Name'] = f'Software {o % 5}'
+            sw['Version'] = '1.0'
+
+    return aml
+
+
+class MAMLBenchmark():
+    '''
+    Time and peak memory of the main conversions on a synthetic Master AML
+
+    Every case is timed as the best of several runs, then run once more
+    under tracemalloc to get its peak memory
+    '''
+
+    def __init__(self, repeat: int = 3, **shape) -> None:
+        self.repeat = repeat
+        self.shape = shape
+        self.results = {}
+
+    def run(self) -> dict:
+        with TemporaryDirectory() as folder:
+            amlPath = join(folder, 'benchmark.aml')
+            jsonPath = join(folder, 'benchmark.json')
+            snapshotPath = join(folder, 'benchmark.snapshot')
+
+            aml = self.measure('generate', lambda: generate(**self.shape))
+            self.measure('toAML', lambda: aml.toAML(amlPath))
+            self.measure('toJSON', lambda: aml.toJSON(jsonPath))
+            self.measure('fromAML', lambda: MasterAML(amlPath))
+            self.measure('fromJSON', lambda: MasterAML(jsonPath))
+
+            # Relative speed of the XML backends
+            for backend in availableBackends():
+                self.measure(
+                    f'fromAML[{backend}]',
+                    lambda: MasterAML(amlPath, backend=backend))
+                self.measure(
+                    f'toAML[{backend}]',
+                    lambda: aml.toAML(amlPath, backend=backend))
+
+            # Relative speed of the JSON backends, indented and compact
+            for backend in availableJSONBackends():
+                self.measure(
+                    f'toJSON[{backend}]',
+                    lambda: aml.toJSON(jsonPath, backend=backend))
+                self.measure(
+                    f'fromJSON[{backend}]',
+                    lambda: MasterAML(jsonPath, jsonBackend=backend))
+                self.measure(
+                    f'toJSON[{backend},compact]',
+                    lambda: aml.toJSON(
+                        jsonPath, compact=True, backend=backend))
+
+            loaded = MasterAML(amlPath)
+
+            # Every ID node must be registered exactly once while loading
+            self.results['IDs'] = {
+                'registrations': loaded.IDs.registrations,
+                'nodes': sum(1 for _ in findkeys(
+                    [loaded.xmld, loaded], ('@ID', 'ID'))),
+            }
+
+            self.measure('toDict', loaded.toDict)
+            self.measure(
+                'saveSnapshot', lambda: loaded.saveSnapshot(snapshotPath))
+            self.measure(
+                'loadSnapshot', lambda: MasterAML.loadSnapshot(snapshotPath))
+
+            IDs = [
+                op['ID']
+                for dt in loaded['Digital Threads']
+                for op in dt['Operations']
+            ]
+            self.measure(
+                'findByID', lambda: [loaded.findByID(ID) for ID in IDs])
+
+        return self.results
+
+    def runEncode(self, links: int = 100000) -> dict:
+        '''
+        Time the encoding of a single Digital Thread with many links
+
+        Every Operation has 5 input files, 4 reused outputs, an output file
+        and a software, so 11 InternalLinks
+        '''
+        aml = generate(
+            threads=1,
+            operations=-(-links // 11),
+            files=5,
+            links=4,
+        )
+        dt = aml['Digital Threads'][0]
+        xmld = self.measure(
+            f'encode[{links} links]', lambda: aml._encodeDigitalThread_(dt))
+        self.results[f'encode[{links} links]']['links'] = \
+            len(xmld['InternalLink'])
+        return self.results
+
+    def runQuery(self, operations: int = 100000) -> dict:
+        '''
+        Time the Operations queries against a loop over the Digital Threads
+
+        The index is built once, then every query only intersects the
+        Operations of its values. The query looks for the few failed
+        Operations of a stage, one in a thousand
+        '''
+        aml = generate(
+            threads=10,
+            operations=-(-operations // 10),
+            files=0,
+            links=0,
+        )
+        stage = next(iter(aml.OperationsLib.values()), {}).get('Stage')
+        for dt in aml['Digital Threads']:
+            for op in dt['Operations'][::1000]:
+                op['Success'] = 'false'
+
+        def loop() -> list:
+            return [
+                op
+                for dt in aml['Digital Threads']
+                for op in dt['Operations']
+                if op['Stage'] == stage and op['Success'] == 'false'
+            ]
+
+        def build():
+            aml._operations_ = None
+            return aml.operations
+
+        self.measure(f'query[{operations} loop]', loop)
+        self.measure(f'query[{operations} index build]', build)
+        self.measure(
+            f'query[{operations} index]',
+            lambda: aml.operations.where(Stage=stage, Success=False))
+
+        # Operations of a one minute window, parsing every timestamp
+        start = parseTimestamp('2023-01-01T01:00:00')
+        end = parseTimestamp('2023-01-01T01:00:59')
+
+        def scan() -> list:
+            operations = []
+            for dt in aml['Digital Threads']:
+                for op in dt['Operations']:
+                    time = parseTimestamp(op['UserInfo']['Timestamp'])
+                    if time is not None and start <= time <= end:
+                        operations.append(op)
+            return sorted(operations, key=lambda op: parseTimestamp(
+                op['UserInfo']['Timestamp']))
+
+        def timeline():
+            aml._timeline_ = None
+            return aml.timeline
+
+        self.measure(f'timeline[{operations} loop]', scan)
+        self.measure(f'timeline[{operations} build]', timeline)
+        self.measure(
+            f'timeline[{operations} between]',
+            lambda: aml.timeline.between(start, end))
+        return self.results
+
+    def runLineage(self, operations: int = 2000) -> dict:
+        '''
+        Time the transitive history of a file against following the links
+
+        Every Operation of a thread uses the outputs of the previous one,
+        so the history of the last output is the whole thread. The loop
+        searches the producers of every file of the history, the lineage
+        query is timed without its memoized closures
+        '''
+        aml = generate(threads=1, operations=operations, files=1, links=1)
+        dt = aml['Digital Threads'][0]
+        fileID = dt['Operations'][-1]['OutputFile'][0]
+
+        def loop() -> list:
+            history = []
+            queue = [fileID]
+            seen = set(queue)
+            while queue:
+                ID = queue.pop()
+                for op in dt['Operations']:
+                    if ID in op['OutputFile'] and op['ID'] not in seen:
+                        seen.add(op['ID'])
+                        history.append(op['ID'])
+                        for inputID in op['InputFile']:
+                            if inputID not in seen:
+                                seen.add(inputID)
+                                queue.append(inputID)
+            return history
+
+        lineage = MAMLLineage(aml)
+
+        def upstream() -> list:
+            lineage._closures_ = ({}, {})
+            return lineage.upstream(fileID, transitive=True)
+
+        self.measure(f'lineage[{operations} loop]', loop)
+        self.measure(f'lineage[{operations} build]', lambda: MAMLLineage(aml))
+        self.measure(f'lineage[{operations} upstream]', upstream)
+        return self.results
+
+    def measure(self, name: str, function):
+        ''' Run function, recording its best time and peak memory '''
+        times = []
+        for _ in range(self.repeat):
+            gc.collect()
+            start = perf_counter()
+            function()
+            times.append(perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.results[name] = {'time': min(times), 'peak': peak}
+        print(f'{name:>24}: {min(times):9.4f} s {peak / 2**20:9.2f} MiB')
+        return result
+
+    def save(self, filePath: str) -> None:
+        ''' Store the results with the shape and environment in JSON '''
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        json.dump({
+            'commit': commit,
+            'python': platform.python_version(),
+            'shape': self.shape,
+            'repeat': self.repeat,
+            'results': self.results,
+        }, open(filePath, mode='w'), indent=2)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark pyMAML conversions')
+    parser.add_argument('--threads', type=int, default=10)
+    parser.add_argument('--operations', type=int, default=10)
+    parser.add_argument('--files', type=int, default=2)
+    parser.add_argument('--links', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--encode-links', type=int, default=None, metavar='N',
+        help='also time the encoding of a Digital Thread with N links')
+    parser.add_argument(
+        '--query-operations', type=int, default=None, metavar='N',
+        help='also time the Operations queries on a document with N '
+             'Operations')
+    parser.add_argument(
+        '--lineage-operations', type=int, default=None, metavar='N',
+        help='also time the lineage queries on a Digital Thread with N '
+             'Operations')
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    args = parser.parse_args()
+
+    benchmark = MAMLBenchmark(
+        repeat=args.repeat,
+        threads=args.threads,
+        operations=args.operations,
+        files=args.files,
+        links=args.links,
+    )
+    benchmark.run()
+    if args.encode_links:
+        benchmark.runEncode(args.encode_links)
+    if args.query_operations:
+        benchmark.runQuery(args.query_operations)
+    if args.lineage_operations:
+        benchmark.runLineage(args.lineage_operations)
+    benchmark.save(args.output)
+    print(f'Results saved to {args.output}')
@@ -0,0 +1,139 @@
+"""
+Check the on-disk cache of decoded documents
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/cache.py
+"""
+
+import os
+import time
+from tempfile import TemporaryDirectory
+
+# correct the path to the root of the library
+from sys import path, exit
+from os.path import dirname, exists, join, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+from pymaml.cache import getCache
+from benchmark import generate
+
+
+class CacheTest():
+    '''
+    Load synthetic files through a cache folder and check the counters,
+    the least recently used eviction and the removal of stale entries
+    '''
+
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+
+        # Files of decreasing size, so the last one fits in place of any
+        self.files = []
+        for name, operations in [('a', 20), ('b', 10), ('c', 5)]:
+            filePath = join(folder, f'{name}.aml')
+            generate(threads=1, operations=operations).export(filePath)
+            self.files.append(filePath)
+
+    def validate(self) -> bool:
+        results = [
+            self.counters(),
+            self.eviction(),
+            self.corrupted(),
+            self.invalidPath(),
+        ]
+        return all(results)
+
+    def cacheDir(self, name: str) -> str:
+        ''' Returns a new cache folder, with its own counters '''
+        return join(self.folder, f'cache {name}')
+
+    def load(self, filePath: str, cacheDir: str, **kargs) -> MasterAML:
+        # Distinct modification times for the least recently used order
+        time.sleep(0.02)
+        return MasterAML(filePath, cacheDir=cacheDir, **kargs)
+
+    @staticmethod
+    def snapshot(cache, filePath: str) -> str:
+        ''' Returns the path of the snapshot of a file, loaded eagerly '''
+        return cache.path(cache.key(filePath), variant='-00')
+
+    def counters(self) -> bool:
+        ''' A miss decodes and caches the file, a hit loads the same one '''
+        cacheDir = self.cacheDir('counters')
+        a, _, _ = self.files
+        missed = self.load(a, cacheDir)
+        hit = self.load(a, cacheDir)
+        stats = hit.cacheStats()
+        return self.report('counters', (
+            stats['hits'] == 1 and
+            stats['misses'] == 1 and
+            stats['entries'] == 1 and
+            hit.toDict() == missed.toDict() and
+            MasterAML(a).cacheStats() is None
+        ))
+
+    def eviction(self) -> bool:
+        '''
+        The least recently used snapshot is evicted, and the hash of its
+        file is removed even if it was used more recently
+        '''
+        cacheDir = self.cacheDir('eviction')
+        a, b, c = self.files
+        self.load(a, cacheDir)
+        self.load(b, cacheDir)
+        self.load(a, cacheDir)
+        cache = getCache(cacheDir)
+        cache.key(b)
+        maxSize = cache.stats()['size']
+        self.load(c, cacheDir, cacheSize=maxSize)
+
+        hashes = len(os.listdir(cache.statFolder))
+        stats = cache.stats()
+        snapshots = [exists(self.snapshot(cache, f)) for f in self.files]
+        return self.report('eviction', (
+            snapshots == [True, False, True] and
+            hashes == 2 and
+            stats['size'] <= maxSize
+        ))
+
+    def corrupted(self) -> bool:
+        ''' A corrupted snapshot is a miss, and is replaced by a valid one '''
+        cacheDir = self.cacheDir('corrupted')
+        a, _, _ = self.files
+        original = self.load(a, cacheDir).toDict()
+        cache = getCache(cacheDir)
+        with open(self.snapshot(cache, a), mode='wb') as f:
+            f.write(b'not a snapshot')
+        reloaded = self.load(a, cacheDir).toDict()
+        cached = self.load(a, cacheDir).toDict()
+        stats = cache.stats()
+        return self.report('corrupted', (
+            stats['hits'] == 1 and
+            stats['misses'] == 2 and
+            original == reloaded == cached
+        ))
+
+    def invalidPath(self) -> bool:
+        ''' Files that cannot be hashed are misses '''
+        cache = getCache(self.cacheDir('invalid'))
+        doc = MasterAML()
+        results = [
+            cache.load(join(self.folder, 'missing.aml'), doc),
+            cache.load('invalid\0.aml', doc),
+        ]
+        return self.report('invalid path', (
+            results == [False, False] and cache.stats()['misses'] == 2
+        ))
+
+    def report(self, name: str, success: bool) -> bool:
+        status = 'worked' if success else 'FAILED'
+        print(f'Cache {status}: {name}')
+        return success
+
+
+if __name__ == '__main__':
+    with TemporaryDirectory() as folder:
+        result = CacheTest(folder).validate()
+    exit(0 if result else 1)
@@ -0,0 +1,164 @@
+"""
+Check the structural differences between two documents
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/compare.py
+"""
+
+import json
+import subprocess
+from tempfile import TemporaryDirectory
+
+# correct the path to the root of the library
+from sys import path, exit, executable
+from os.path import dirname, join, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+from pymaml.compare import diff, iterDiff, formatChange
+
+
+def buildDocuments() -> tuple:
+    '''
+    Returns a hand-built Master AML, a modified plain copy of it and the
+    expected differences, with the added and removed elements as their ID
+    '''
+    a = MasterAML(replicableIDs=True)
+    a['FileName'] = 'a.aml'
+    IDs = {}
+    t1 = a.newDigitalThread()
+    t1['Name'] = 'T1'
+    op1 = t1.newOperation()
+    op1['Name'] = 'op1'
+    op1['Success'] = 'true'
+    op1['UserInfo']['Timestamp'] = '2023-01-01T00:00:00'
+    for name in ['f1', 'f2', 'f3']:
+        f = t1.newFile()
+        f['Name'] = name
+        IDs[name] = f['ID']
+    op1['InputFile'].append(IDs['f1'])
+    op1['OutputFile'].append(IDs['f2'])
+    sw1 = t1.newSoftware()
+    sw1['Name'] = 'sw1'
+    sw1['ConfigFile'].append(IDs['f3'])
+    t2 = a.newDigitalThread()
+    t2['Name'] = 'T2'
+    t2.newOperation()['Name'] = 'op2'
+    for name, element in [
+        ('t1', t1), ('t2', t2), ('op1', op1), ('sw1', sw1)
+    ]:
+        IDs[name] = element['ID']
+
+    b = json.loads(json.dumps(a.toDict()))
+    b['FileName'] = 'b.aml'
+    t1 = b['Digital Threads'][0]
+    t1['Name'] = 'Thread 1'
+    op1 = t1['Operations'][0]
+    op1['Success'] = 'false'
+    op1['UserInfo']['Timestamp'] = '2023-01-02T00:00:00'
+    op1['InputFile'] = [IDs['f3']]
+    t1['Files'].append(dict(t1['Files'][0], ID='f4', Name='f4'))
+    t1['Softwares'].pop()
+    t3 = dict(b['Digital Threads'].pop(), ID='t3', Name='T3')
+    b['Digital Threads'].append(t3)
+
+    expected = [
+        ('changed', None, None, 'FileName', 'a.aml', 'b.aml'),
+        ('changed', 'Digital Thread', IDs['t1'], 'Name', 'T1', 'Thread 1'),
+        ('changed', 'Operation', IDs['op1'], 'Success', 'true', 'false'),
+        ('changed', 'Operation', IDs['op1'], 'UserInfo.Timestamp',
+         '2023-01-01T00:00:00', '2023-01-02T00:00:00'),
+        ('unlinked', 'Operation', IDs['op1'], 'InputFile', IDs['f1'], None),
+        ('linked', 'Operation', IDs['op1'], 'InputFile', None, IDs['f3']),
+        ('added', 'File', 'f4', None, None, 'f4'),
+        ('removed', 'Software', IDs['sw1'], None, IDs['sw1'], None),
+        ('removed', 'Digital Thread', IDs['t2'], None, IDs['t2'], None),
+        ('added', 'Digital Thread', 't3', None, None, 't3'),
+    ]
+    return a, b, expected
+
+
+class CompareTest():
+    ''' Check diff(), iterDiff() and --diff against the expected changes '''
+
+    def validate(self) -> bool:
+        results = [
+            self.changes(),
+            self.format(),
+            self.command(),
+        ]
+        return all(results)
+
+    @staticmethod
+    def simplified(changes: list) -> list:
+        ''' Returns the changes with the added and removed elements IDs '''
+        return [
+            tuple(
+                value['ID'] if isinstance(value, dict) else value
+                for value in change
+            )
+            for change in changes
+        ]
+
+    def changes(self) -> bool:
+        a, b, expected = buildDocuments()
+        return self.report('changes', (
+            self.simplified(diff(a, b)) == expected and
+            self.simplified(iterDiff(b, a))[0] ==
+            ('changed', None, None, 'FileName', 'b.aml', 'a.aml') and
+            diff(a, a) == [] and
+            diff(b, json.loads(json.dumps(b))) == []
+        ))
+
+    def format(self) -> bool:
+        a, b, expected = buildDocuments()
+        lines = [formatChange(change) for change in diff(a, b)]
+        op1 = expected[2][2]
+        f1 = expected[4][4]
+        f3 = expected[5][5]
+        return self.report('format', (
+            lines[0] == "~ Document FileName: 'a.aml' -> 'b.aml'" and
+            lines[2] == f"~ Operation {op1} Success: 'true' -> 'false'" and
+            lines[4] == f'- Operation {op1} InputFile: {f1}' and
+            lines[5] == f'+ Operation {op1} InputFile: {f3}' and
+            lines[6] == "+ File f4 'f4'" and
+            lines[-1] == "+ Digital Thread t3 'T3'"
+        ))
+
+    def command(self) -> bool:
+        ''' python -m pymaml --diff exits with 1 only if files differ '''
+        a, b, expected = buildDocuments()
+        with TemporaryDirectory() as folder:
+            files = {
+                name: join(folder, name)
+                for name in ['a.aml', 'a.json', 'b.aml']
+            }
+            a.export(files['a.aml'])
+            a.export(files['a.json'])
+            MasterAML(b).export(files['b.aml'])
+
+            results = []
+            for first, second, code in [
+                ('a.aml', 'a.aml', 0),
+                ('a.aml', 'a.json', 0),
+                ('a.aml', 'b.aml', 1),
+            ]:
+                run = subprocess.run(
+                    [executable, '-m', 'pymaml', '--diff',
+                     files[first], files[second]],
+                    cwd=root_path, capture_output=True, text=True)
+                changes = len(expected) if code else 0
+                results.append(
+                    run.returncode == code and
+                    run.stdout.splitlines()[-1] == f'{changes} changes')
+        return self.report('--diff', all(results))
+
+    def report(self, name: str, success: bool) -> bool:
+        status = 'worked' if success else 'FAILED'
+        print(f'Compare {status}: {name}')
+        return success
+
+
+if __name__ == '__main__':
+    exit(0 if CompareTest().validate() else 1)
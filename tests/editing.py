@@ -0,0 +1,250 @@
+"""
+Check the export of edited files against a full re-encode
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/editing.py [file.aml ...]
+
+Without files, a synthetic Master AML is generated
+"""
+
+import re
+import json
+from tempfile import TemporaryDirectory
+
+# correct the path to the root of the library
+from sys import path, argv, exit
+from os.path import dirname, join, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+
+
+class EditingTest():
+    '''
+    Edit a loaded file, export it and compare the reloaded document with
+    the one of a full re-encode, from a plain copy of the simplified
+    dictionary
+
+    Exports only encode again the modified elements, the others are passed
+    through with their links, so both must give the same document
+    '''
+
+    def __init__(self, filePath, folder: str, lazy=False) -> None:
+        self.filePath = filePath
+        self.folder = folder
+        self.lazy = lazy
+
+    def validate(self) -> bool:
+        results = [
+            self.unmodified(),
+            self.check('rename', self.rename),
+            self.check('link', self.link),
+            self.check('link unlinked file', self.linkUnlinked),
+            self.check('unlink', self.unlink),
+            self.check('remove operation', self.removeOperation),
+            self.check('remove linked file', self.removeFile),
+            self.check('pop', self.pop),
+            self.check('popitem', self.popitem),
+            self.check('merge', self.merge),
+            self.touched(),
+            self.lookups(),
+        ]
+        return all(results)
+
+    def load(self) -> MasterAML:
+        return MasterAML(self.filePath, lazy=self.lazy)
+
+    def reload(self, aml: MasterAML, name: str) -> MasterAML:
+        ''' Export and load again a document '''
+        filePath = join(self.folder, f'{name}.aml')
+        aml.export(filePath)
+        return MasterAML(filePath)
+
+    def unmodified(self) -> bool:
+        '''
+        An unmodified document is exported byte-identical to its source
+
+        Except the IDs of the header, the InstanceHierarchy and the
+        libraries, which are created again from the template
+        '''
+        filePath = join(self.folder, 'unmodified.aml')
+        self.load().export(filePath)
+        return self.report(
+            'unmodified',
+            self.masked(filePath) == self.masked(self.filePath))
+
+    @staticmethod
+    def masked(filePath: str) -> str:
+        ''' Returns the text of an AML file without the header IDs '''
+        return re.sub(
+            r'(<(?:InstanceHierarchy|SystemUnitClass) [^>]*ID=")[^"]*',
+            r'\1', open(filePath, mode='r').read())
+
+    def check(self, name: str, edit) -> bool:
+        ''' Compare the partial and the full re-encode of an edition '''
+        aml = self.load()
+        edit(aml['Digital Threads'][0])
+        unique = True
+        try:
+            partial = self.reload(aml, f'{name} partial')
+            unique = self.uniqueLinks(partial)
+            partial = partial.toDict()
+        except KeyError as e:
+            partial = e
+        try:
+            plain = json.loads(json.dumps(aml.toDict()))
+            full = self.reload(MasterAML(plain), f'{name} full')
+            full = full.toDict()
+        except KeyError as e:
+            full = e
+
+        # Both must fail the same way, or give the same document
+        if isinstance(partial, KeyError) or isinstance(full, KeyError):
+            return self.report(name, repr(partial) == repr(full))
+        return self.report(name, partial == full and unique)
+
+    @staticmethod
+    def uniqueLinks(aml: MasterAML) -> bool:
+        ''' Check the InternalLinks names of every Digital Thread '''
+        for dt in aml['Digital Threads']:
+            names = [link['@Name'] for link in dt.xmld['InternalLink']]
+            if len(names) != len(set(names)):
+                print(f'Duplicated InternalLink names in {dt["Name"]}')
+                return False
+        return True
+
+    def touched(self) -> bool:
+        ''' Every change of an element marks it and its thread as modified '''
+        edits = {
+            'setitem': lambda op: op.__setitem__('Success', 'false'),
+            'delitem': lambda op: op.__delitem__('Comments'),
+            'update': lambda op: op.update(Success='false'),
+            'pop': lambda op: op.pop('Success'),
+            'popitem': lambda op: op.popitem(),
+            'setdefault': lambda op: op.setdefault('Extra', 'value'),
+            'merge': lambda op: op.__ior__({'Success': 'false'}),
+            'clear': lambda op: op.clear(),
+        }
+        success = True
+        for name, edit in edits.items():
+            dt = self.load()['Digital Threads'][0]
+            op = dt['Operations'][0]
+            edit(op)
+            if not (op.dirty and dt.dirty):
+                print(f'Not marked as modified: {name}')
+                success = False
+        return self.report('touched', success)
+
+    def lookups(self) -> bool:
+        ''' Missing IDs raise a KeyError, added and renamed ones are found '''
+        aml = self.load()
+        dt = aml['Digital Threads'][0]
+        op = dt['Operations'][0]
+        results = []
+        for _ in range(2):
+            try:
+                aml.findByID('missing')
+                results.append(False)
+            except KeyError:
+                results.append(True)
+        f = {'ID': 'added', 'Name': 'added'}
+        dt['Files'].append(f)
+        op['ID'] = 'renamed'
+        results += [
+            aml.findByID('added') is f,
+            aml.findByID('renamed') is op,
+        ]
+        return self.report('lookups', all(results))
+
+    def report(self, name: str, success: bool) -> bool:
+        mode = 'lazy' if self.lazy else 'eager'
+        status = 'worked' if success else 'FAILED'
+        print(f'Editing {status}: {name} ({mode}) --> {self.filePath}')
+        return success
+
+    @staticmethod
+    def rename(dt: dict) -> None:
+        dt['Operations'][0]['Name'] = 'Renamed'
+
+    @staticmethod
+    def link(dt: dict) -> None:
+        op = dt['Operations'][-1]
+        op['InputFile'].append(next(
+            f['ID'] for f in dt['Files'] if f['ID'] not in op['InputFile']))
+
+    @staticmethod
+    def linkUnlinked(dt: dict) -> None:
+        ''' Link a File passed through without any External Interface '''
+        linked = {
+            ID
+            for op in dt['Operations']
+            for key in ['InputFile', 'OutputFile']
+            for ID in op[key]
+        }
+        linked.update(ID for sw in dt['Softwares'] for ID in sw['ConfigFile'])
+        unlinked = [f['ID'] for f in dt['Files'] if f['ID'] not in linked]
+        if unlinked:
+            dt['Operations'][-1]['InputFile'].append(unlinked[0])
+
+    @staticmethod
+    def unlink(dt: dict) -> None:
+        for op in dt['Operations']:
+            if op['InputFile']:
+                op['InputFile'].pop()
+                break
+
+    @staticmethod
+    def pop(dt: dict) -> None:
+        dt['Operations'][0].pop('Success')
+
+    @staticmethod
+    def popitem(dt: dict) -> None:
+        dt['Operations'][0].popitem()
+
+    @staticmethod
+    def merge(dt: dict) -> None:
+        op = dt['Operations'][0]
+        op |= {'Success': 'false'}
+
+    @staticmethod
+    def removeOperation(dt: dict) -> None:
+        dt['Operations'].pop(0)
+
+    @staticmethod
+    def removeFile(dt: dict) -> None:
+        ''' Remove a File still listed by an unmodified Operation '''
+        for op in dt['Operations']:
+            if op['OutputFile']:
+                ID = op['OutputFile'][0]
+                break
+        else:
+            return
+        for i, f in enumerate(dt['Files']):
+            if f['ID'] == ID:
+                del dt['Files'][i]
+                break
+
+
+def generateFile(filePath: str) -> None:
+    ''' Save a synthetic Master AML with an unlinked File '''
+    from benchmark import generate
+
+    aml = generate(threads=2, operations=5, files=1, links=1)
+    aml['Digital Threads'][0].newFile()['Name'] = 'unlinked.csv'
+    aml.export(filePath)
+
+
+if __name__ == '__main__':
+    with TemporaryDirectory() as folder:
+        filePaths = argv[1:]
+        if not filePaths:
+            filePaths = [join(folder, 'generated.aml')]
+            generateFile(filePaths[0])
+
+        results = [
+            EditingTest(filePath, folder, lazy=lazy).validate()
+            for filePath in filePaths
+            for lazy in [False, True]
+        ]
+    exit(0 if all(results) else 1)
@@ -0,0 +1,158 @@
+"""
+Check the transitive queries of the lineage graph
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/lineage.py
+"""
+
+# correct the path to the root of the library
+from sys import path, exit
+from os.path import dirname, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+from pymaml.lineage import MAMLLineage
+
+
+def buildDocument() -> tuple:
+    '''
+    Returns a hand-built Master AML and its elements IDs by name
+
+        raw --> op1 --> mid --> op2 --> out
+        sw ---> op1
+        cfg --> sw
+
+    op3 reads out and writes raw, closing a cycle, but is only linked by
+    closeCycle(), and op4 reads a File which is not in the document
+    '''
+    aml = MasterAML(replicableIDs=True)
+    dt = aml.newDigitalThread()
+    IDs = {}
+    for name in ['op1', 'op2', 'op3', 'op4']:
+        IDs[name] = dt.newOperation()['ID']
+    for name in ['raw', 'mid', 'out', 'cfg']:
+        IDs[name] = dt.newFile()['ID']
+    sw = dt.newSoftware()
+    IDs['sw'] = sw['ID']
+    sw['ConfigFile'].append(IDs['cfg'])
+
+    op1, op2, op3, op4 = dt['Operations']
+    op1['InputFile'].append(IDs['raw'])
+    op1['SoftwareUsed'].append(IDs['sw'])
+    op1['OutputFile'].append(IDs['mid'])
+    op2['InputFile'].append(IDs['mid'])
+    op2['OutputFile'].append(IDs['out'])
+    op4['InputFile'].append('missing')
+    return aml, IDs
+
+
+def closeCycle(aml: MasterAML, IDs: dict) -> None:
+    op3 = aml.findByID(IDs['op3'])
+    op3['InputFile'].append(IDs['out'])
+    op3['OutputFile'].append(IDs['raw'])
+
+
+class LineageTest():
+    ''' Check upstream() and downstream() against the expected elements '''
+
+    def validate(self) -> bool:
+        results = [
+            self.direct(),
+            self.transitive(),
+            self.cycle(),
+            self.errors(),
+        ]
+        return all(results)
+
+    @staticmethod
+    def names(IDs: dict, found: list) -> set:
+        ''' Returns the names of the IDs found, checking they are unique '''
+        byID = {ID: name for name, ID in IDs.items()}
+        names = {byID[ID] for ID in found}
+        return names if len(names) == len(found) else None
+
+    def direct(self) -> bool:
+        aml, IDs = buildDocument()
+        lineage = MAMLLineage(aml)
+        return self.report('direct', (
+            self.names(IDs, lineage.upstream(IDs['op1'])) ==
+            {'raw', 'sw'} and
+            self.names(IDs, lineage.downstream(IDs['op1'])) == {'mid'} and
+            self.names(IDs, lineage.upstream(IDs['sw'])) == {'cfg'} and
+            lineage.upstream(IDs['raw']) == [] and
+            lineage.downstream(IDs['out']) == [] and
+            lineage.kind(IDs['sw']) == 'Software' and
+            lineage.kind(IDs['out']) == 'File' and
+            len(lineage) == 9 and
+            lineage.dangling == [('missing', IDs['op4'])]
+        ))
+
+    def transitive(self) -> bool:
+        aml, IDs = buildDocument()
+        lineage = MAMLLineage(aml)
+        history = {'op2', 'mid', 'op1', 'raw', 'sw', 'cfg'}
+        files = lineage.upstreamMany([IDs['out'], IDs['mid']], kind='File')
+        return self.report('transitive', (
+            self.names(IDs, lineage.upstream(
+                IDs['out'], transitive=True)) == history and
+            self.names(IDs, lineage.upstream(
+                IDs['out'], transitive=True, kind='Operation')) ==
+            {'op1', 'op2'} and
+            self.names(IDs, lineage.downstream(
+                IDs['cfg'], transitive=True)) ==
+            {'sw', 'op1', 'mid', 'op2', 'out'} and
+            self.names(IDs, lineage.downstream(
+                IDs['raw'], transitive=True, kind='File')) ==
+            {'mid', 'out'} and
+            self.names(IDs, files[IDs['out']]) == {'mid', 'raw', 'cfg'} and
+            self.names(IDs, files[IDs['mid']]) == {'raw', 'cfg'}
+        ))
+
+    def cycle(self) -> bool:
+        ''' Elements of a cycle are part of their own closure '''
+        aml, IDs = buildDocument()
+        closeCycle(aml, IDs)
+        lineage = MAMLLineage(aml)
+        cycle = {'raw', 'op1', 'mid', 'op2', 'out', 'op3'}
+        return self.report('cycle', (
+            self.names(IDs, lineage.upstream(
+                IDs['raw'], transitive=True)) == cycle | {'sw', 'cfg'} and
+            self.names(IDs, lineage.downstream(
+                IDs['op1'], transitive=True)) == cycle and
+            self.names(IDs, lineage.downstream(
+                IDs['cfg'], transitive=True)) == cycle | {'sw'} and
+            self.names(IDs, lineage.downstreamMany(
+                [IDs['out']], kind='Operation')[IDs['out']]) ==
+            {'op1', 'op2', 'op3'}
+        ))
+
+    def errors(self) -> bool:
+        ''' Unknown elements and kinds, and graphs not rebuilt '''
+        aml, IDs = buildDocument()
+        lineage = MAMLLineage(aml)
+        results = []
+        for query, error in [
+            (lambda: lineage.upstream('missing'), KeyError),
+            (lambda: lineage.upstream(IDs['out'], kind='Thread'), ValueError),
+        ]:
+            try:
+                query()
+                results.append(False)
+            except error:
+                results.append(True)
+
+        closeCycle(aml, IDs)
+        results.append(lineage.upstream(IDs['raw']) == [])
+        lineage.rebuild()
+        results.append(lineage.upstream(IDs['raw']) == [IDs['op3']])
+        return self.report('errors and rebuild', all(results))
+
+    def report(self, name: str, success: bool) -> bool:
+        status = 'worked' if success else 'FAILED'
+        print(f'Lineage {status}: {name}')
+        return success
+
+
+if __name__ == '__main__':
+    exit(0 if LineageTest().validate() else 1)
@@ -0,0 +1,223 @@
+"""
+Check the indexed queries and the timeline of the Operations of a document
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/query.py
+"""
+
+# correct the path to the root of the library
+from sys import path, exit
+from os.path import dirname, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+
+
+def buildDocument() -> tuple:
+    '''
+    Returns a hand-built Master AML and its Operations by name
+
+    Thread A: op1, op2 and op3 (undated), thread B: op4 and op5 (invalid
+    timestamp). Timestamps with a time zone are compared in UTC
+    '''
+    aml = MasterAML(replicableIDs=True)
+    ops = {}
+    for thread, operations in [
+        ('A', [
+            ('op1', 'CAD', 'Design', 'true', 'alice', '2023-01-01T10:00:00'),
+            ('op2', 'CAM', 'Build', 'false', 'bob',
+             '2023-01-02T10:00:00+02:00'),
+            ('op3', 'CAM', 'Build', 'true', 'alice', None),
+        ]),
+        ('B', [
+            ('op4', 'CAD', 'Build', True, 'bob', '2023-01-02T09:00:00Z'),
+            ('op5', 'QA', 'Inspect', 'true', None, 'yesterday'),
+        ]),
+    ]:
+        dt = aml.newDigitalThread()
+        dt['Name'] = thread
+        for name, module, stage, success, user, timestamp in operations:
+            op = dt.newOperation()
+            op['Name'] = name
+            op['Module'] = module
+            op['Stage'] = stage
+            op['Success'] = success
+            op['UserInfo']['Username'] = user
+            op['UserInfo']['Timestamp'] = timestamp
+            ops[name] = op
+    return aml, ops
+
+
+class OperationIndexTest():
+    ''' Check where(), count() and values() against the expected results '''
+
+    def validate(self) -> bool:
+        results = [
+            self.where(),
+            self.edits(),
+        ]
+        return all(results)
+
+    @staticmethod
+    def names(operations: list) -> list:
+        return [op['Name'] for op in operations]
+
+    def where(self) -> bool:
+        aml, _ = buildDocument()
+        index = aml.operations
+        try:
+            index.where(Unknown='value')
+            unknown = False
+        except KeyError:
+            unknown = True
+        return self.report('where', (
+            self.names(index.where(Stage='Build')) == ['op2', 'op3', 'op4']
+            and self.names(index.where(Stage='Build', Success=True)) ==
+            ['op3', 'op4'] and
+            self.names(index.where(Success='false')) == ['op2'] and
+            self.names(index.where(Username='alice')) == ['op1', 'op3'] and
+            index.where(Module='CAD', Stage='Inspect') == [] and
+            index.count(Module='CAM') == 2 and
+            index.count() == 5 and
+            index.values('Module') == {'CAD': 2, 'CAM': 2, 'QA': 1} and
+            unknown
+        ))
+
+    def edits(self) -> bool:
+        ''' Changes, new and removed Operations are reflected '''
+        aml, ops = buildDocument()
+        index = aml.operations
+        ops['op1']['Stage'] = 'Build'
+        ops['op3']['UserInfo']['Username'] = 'carol'
+        ops['op5'] |= {'Module': 'CAM'}
+        results = [
+            self.names(index.where(Stage='Build')) ==
+            ['op1', 'op2', 'op3', 'op4'],
+            self.names(index.where(Username='carol')) == ['op3'],
+            self.names(index.where(Module='CAM')) == ['op2', 'op3', 'op5'],
+        ]
+
+        dtA, dtB = aml['Digital Threads']
+        dtA['Operations'].remove(ops['op2'])
+        del dtB['Operations'][0]
+        new = dtA.newOperation()
+        new['Name'] = 'op6'
+        new['Stage'] = 'Build'
+        results += [
+            self.names(index.where(Stage='Build')) == ['op1', 'op3', 'op6'],
+            index.count() == 4,
+        ]
+
+        aml['Digital Threads'].pop()
+        results.append(self.names(index) == ['op1', 'op3', 'op6'])
+        return self.report('edits', all(results))
+
+    def report(self, name: str, success: bool) -> bool:
+        status = 'worked' if success else 'FAILED'
+        print(f'Operation index {status}: {name}')
+        return success
+
+
+class TimelineTest():
+    ''' Check between(), latest() and windows() against expected results '''
+
+    def validate(self) -> bool:
+        results = [
+            self.between(),
+            self.latest(),
+            self.windows(),
+            self.edits(),
+        ]
+        return all(results)
+
+    names = staticmethod(OperationIndexTest.names)
+
+    def between(self) -> bool:
+        ''' Bounds are included, and compared in UTC '''
+        aml, _ = buildDocument()
+        timeline = aml.timeline
+        try:
+            timeline.between('tomorrow')
+            invalid = False
+        except ValueError:
+            invalid = True
+        return self.report('between', (
+            self.names(timeline.between()) == ['op1', 'op2', 'op4'] and
+            self.names(timeline.between('2023-01-02')) == ['op2', 'op4'] and
+            self.names(timeline.between(
+                '2023-01-01T10:00:00', '2023-01-02T08:00:00')) ==
+            ['op1', 'op2'] and
+            self.names(timeline.between(
+                end='2023-01-02T10:30:00+02:00')) == ['op1', 'op2'] and
+            self.names(timeline.between(dt=aml['Digital Threads'][1])) ==
+            ['op4'] and
+            timeline.between('2024-01-01') == [] and
+            self.names(timeline.undated) == ['op3', 'op5'] and
+            len(timeline) == 3 and
+            invalid
+        ))
+
+    def latest(self) -> bool:
+        aml, _ = buildDocument()
+        timeline = aml.timeline
+        dtA = aml['Digital Threads'][0]
+        return self.report('latest', (
+            self.names(timeline.latest()) == ['op4'] and
+            self.names(timeline.latest(2)) == ['op4', 'op2'] and
+            self.names(timeline.latest(10)) == ['op4', 'op2', 'op1'] and
+            self.names(timeline.latest(dt=dtA)) == ['op2'] and
+            self.names(timeline.latest(dt=dtA['ID'])) == ['op2'] and
+            timeline.latest(0) == [] and
+            timeline.latest(dt='unknown') == []
+        ))
+
+    def windows(self) -> bool:
+        aml, _ = buildDocument()
+        dtA, dtB = (dt['ID'] for dt in aml['Digital Threads'])
+        windows = aml.timeline.windows(end='2023-01-02T08:30:00')
+        return self.report('windows', (
+            {ID: self.names(ops) for ID, ops in windows.items()} ==
+            {dtA: ['op1', 'op2'], dtB: []}
+        ))
+
+    def edits(self) -> bool:
+        ''' Changed timestamps, new and removed Operations are reflected '''
+        aml, ops = buildDocument()
+        timeline = aml.timeline
+        ops['op3']['UserInfo']['Timestamp'] = '2023-01-03T00:00:00'
+        ops['op1']['UserInfo']['Timestamp'] = None
+        results = [
+            self.names(timeline.between()) == ['op2', 'op4', 'op3'],
+            self.names(timeline.undated) == ['op5', 'op1'],
+        ]
+
+        dtA, dtB = aml['Digital Threads']
+        new = dtB.newOperation()
+        new['Name'] = 'op6'
+        new['UserInfo']['Timestamp'] = '2023-01-02T08:30:00'
+        results.append(
+            self.names(timeline.between()) == ['op2', 'op6', 'op4', 'op3'])
+
+        dtA['Operations'].remove(ops['op2'])
+        results.append(
+            self.names(timeline.between()) == ['op6', 'op4', 'op3'])
+        aml['Digital Threads'].pop()
+        results += [
+            self.names(timeline.latest(10)) == ['op3'],
+            self.names(timeline.undated) == ['op1'],
+        ]
+        return self.report('edits', all(results))
+
+    def report(self, name: str, success: bool) -> bool:
+        status = 'worked' if success else 'FAILED'
+        print(f'Timeline {status}: {name}')
+        return success
+
+
+if __name__ == '__main__':
+    results = [
+        OperationIndexTest().validate(),
+        TimelineTest().validate(),
+    ]
+    exit(0 if all(results) else 1)
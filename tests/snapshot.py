@@ -0,0 +1,121 @@
+"""
+Check the binary snapshots of decoded documents
+
+Launch from the main project folder:
+    ~/pyMAML$  python tests/snapshot.py [file.aml ...]
+
+Without files, a synthetic Master AML is generated
+"""
+
+import gzip
+import json
+import struct
+from tempfile import TemporaryDirectory
+
+# correct the path to the root of the library
+from sys import path, argv, exit
+from os.path import dirname, join, realpath
+root_path = dirname(dirname(realpath(__file__)))
+path.insert(0, root_path)
+
+from pymaml.master import MasterAML
+from pymaml.snapshot import MAGIC
+from editing import EditingTest
+
+
+class SnapshotTest():
+    '''
+    Save a loaded file to snapshots and check that they are loaded as the
+    same document, and that invalid or stale snapshots are rejected
+    '''
+
+    def __init__(self, filePath, folder: str, lazy=False) -> None:
+        self.filePath = filePath
+        self.folder = folder
+        self.lazy = lazy
+        self.aml = MasterAML(filePath, lazy=lazy)
+
+    def validate(self) -> bool:
+        results = [
+            self.roundtrip('snapshot', 'doc.snapshot'),
+            self.roundtrip('gzipped snapshot', 'doc.snapshot.gz'),
+            self.gzipped(),
+            self.rejects('truncated', self.truncate),
+            self.rejects('wrong version', self.rewrite, version=0),
+            self.rejects('other library', self.rewrite, library='other'),
+        ]
+        return all(results)
+
+    def save(self, name: str) -> str:
+        filePath = join(self.folder, name)
+        self.aml.saveSnapshot(filePath)
+        return filePath
+
+    def roundtrip(self, name: str, fileName: str) -> bool:
+        ''' A snapshot gives the same dict and the same AML output '''
+        loaded = MasterAML.loadSnapshot(self.save(fileName))
+        sameDict = loaded.toDict() == self.aml.toDict()
+
+        outputs = []
+        for aml, output in [(self.aml, 'original'), (loaded, 'loaded')]:
+            filePath = join(self.folder, f'{output}.aml')
+            aml.export(filePath)
+            outputs.append(EditingTest.masked(filePath))
+        return self.report(name, sameDict and outputs[0] == outputs[1])
+
+    def gzipped(self) -> bool:
+        ''' Snapshots paths ending with .gz are gzipped '''
+        with gzip.open(self.save('doc.snapshot.gz'), mode='rb') as stream:
+            return self.report('gzip file', stream.read(len(MAGIC)) == MAGIC)
+
+    def rejects(self, name: str, corrupt, **kargs) -> bool:
+        ''' Invalid snapshots must raise a ValueError '''
+        filePath = self.save(f'{name}.snapshot')
+        corrupt(filePath, **kargs)
+        try:
+            MasterAML.loadSnapshot(filePath)
+        except ValueError:
+            return self.report(name, True)
+        return self.report(name, False)
+
+    @staticmethod
+    def truncate(filePath: str) -> None:
+        ''' Remove the end of the pickled document '''
+        data = open(filePath, mode='rb').read()
+        open(filePath, mode='wb').write(data[:-10])
+
+    @staticmethod
+    def rewrite(filePath: str, **fields) -> None:
+        ''' Change fields of the header, keeping it valid JSON '''
+        data = open(filePath, mode='rb').read()
+        start = len(MAGIC) + 4
+        length, = struct.unpack('>I', data[len(MAGIC):start])
+        header = json.loads(data[start:start + length])
+        header.update(fields)
+        header = json.dumps(header).encode('utf-8')
+        open(filePath, mode='wb').write(
+            MAGIC + struct.pack('>I', len(header)) + header +
+            data[start + length:])
+
+    def report(self, name: str, success: bool) -> bool:
+        mode = 'lazy' if self.lazy else 'eager'
+        status = 'worked' if success else 'FAILED'
+        print(f'Snapshot {status}: {name} ({mode}) --> {self.filePath}')
+        return success
+
+
+if __name__ == '__main__':
+    from editing import generateFile
+
+    with TemporaryDirectory() as folder:
+        filePaths = argv[1:]
+        if not filePaths:
+            filePaths = [join(folder, 'generated.aml')]
+            generateFile(filePaths[0])
+
+        results = [
+            SnapshotTest(filePath, folder, lazy=lazy).validate()
+            for filePath in filePaths
+            for lazy in [False, True]
+        ]
+    exit(0 if all(results) else 1)